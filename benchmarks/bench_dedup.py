@@ -0,0 +1,84 @@
+"""Spec size and memory before and after ``deduplicate_schemas``.
+
+Every path inlines copies of the same envelope and error schemas, as specs
+built from dataclasses or inline models do, for each OpenAPI version.
+
+Run with ``python benchmarks/bench_dedup.py 1000``.
+"""
+import copy
+import json
+import sys
+import time
+import tracemalloc
+from typing import List, Optional
+
+from pydantic import BaseModel
+from synth import make_spec
+
+from apispec_plugins import utils
+
+
+class Error(BaseModel):
+    code: int
+    description: Optional[str]
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    tags: List[str] = []
+
+
+class Page(BaseModel):
+    items: List[Item]
+    total: int
+    next: Optional[str]
+
+
+def build(version, paths):
+    spec = make_spec(version)
+    page = copy.deepcopy(Page.schema())
+    page["properties"]["items"]["items"] = page.pop("definitions")["Item"]
+    for i in range(paths):
+        responses = {
+            200: {"description": "a page", "schema": copy.deepcopy(page)},
+            400: {"description": "an error", "schema": copy.deepcopy(Error.schema())},
+        }
+        if spec.openapi_version.major >= 3:
+            for response in responses.values():
+                schema = response.pop("schema")
+                response["content"] = {"application/json": {"schema": schema}}
+        spec.path(path=f"/items/{i}", operations={"get": {"responses": responses}})
+    return spec
+
+
+def retained(spec):
+    """Memory held by a copy of the built spec."""
+    tracemalloc.start()
+    try:
+        copied = copy.deepcopy(spec.to_dict())
+        return tracemalloc.get_traced_memory()[0], copied
+    finally:
+        tracemalloc.stop()
+
+
+def main(paths=1000):
+    row = "{:<8} {:<10} {:>12} {:>12} {:>10}"
+    print(row.format("oas", "spec", "JSON KiB", "held KiB", "seconds"))
+    for version in ("2.0", "3.0.3"):
+        spec = build(version, paths)
+        size = len(json.dumps(spec.to_dict()))
+        print(
+            row.format(version, "inlined", size // 1024, retained(spec)[0] // 1024, "")
+        )
+
+        start = time.perf_counter()
+        utils.deduplicate_schemas(spec)
+        elapsed = time.perf_counter() - start
+        size = len(json.dumps(spec.to_dict()))
+        held = retained(spec)[0] // 1024
+        print(row.format(version, "deduped", size // 1024, held, f"{elapsed:.4f}"))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
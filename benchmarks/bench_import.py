@@ -0,0 +1,33 @@
+"""Import time of the package and of its plugins.
+
+Every case runs in a fresh interpreter, so module caches don't carry over.
+Run with ``python benchmarks/bench_import.py``.
+"""
+import subprocess
+import sys
+import time
+
+CASES = {
+    "apispec_plugins": "import apispec_plugins",
+    "spec_from": "from apispec_plugins import spec_from",
+    "RegistryMixin": "from apispec_plugins import RegistryMixin",
+    "PydanticPlugin": "from apispec_plugins import PydanticPlugin",
+    "FlaskPlugin": "from apispec_plugins import FlaskPlugin",
+}
+
+
+def import_time(statement):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], check=True)
+    return time.perf_counter() - start
+
+
+def main(repeat=10):
+    baseline = min(import_time("pass") for _ in range(repeat))
+    for label, statement in CASES.items():
+        best = min(import_time(statement) for _ in range(repeat))
+        print(f"{label:>16}: {(best - baseline) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
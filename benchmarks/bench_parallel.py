@@ -0,0 +1,32 @@
+"""Scaling of ``FlaskPlugin.register_app`` with the number of workers.
+
+Run with ``python benchmarks/bench_parallel.py [routes]``.
+"""
+import json
+import os
+import sys
+import time
+
+from synth import make_app, make_spec
+
+from apispec_plugins import utils
+
+
+def main(routes=2000):
+    app = make_app(routes)
+    reference = None
+    for workers in sorted({1, 2, 4, 8, os.cpu_count()}):
+        utils.docstring_cache_clear()
+        spec = make_spec()
+        start = time.perf_counter()
+        spec.plugins[0].register_app(app, workers=workers)
+        elapsed = time.perf_counter() - start
+
+        output = json.dumps(spec.to_dict())
+        reference = reference or output
+        identical = "identical" if output == reference else "DIFFERENT"
+        print(f"{workers:>3} workers: {elapsed:7.3f}s ({identical})")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,94 @@
+"""Spec generation at scale: wall time, peak memory and allocated blocks.
+
+Synthetic Flask apps with function views and method views are documented
+with ``FlaskPlugin.register_app``, pydantic model graphs are registered as
+components, and the resulting spec is converted with ``to_dict``, for each
+OpenAPI version.
+
+Run with ``python benchmarks/bench_spec.py --routes 100 1000 10000``.
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+from synth import make_app, make_models, make_spec
+
+from apispec_plugins import utils
+
+
+def measure(func):
+    """Run ``func`` twice, once timed and once traced for memory.
+
+    Returns the wall time, the traced peak memory and the number of memory
+    blocks still allocated after the traced run, e.g. by caches.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak, sys.getallocatedblocks() - blocks
+
+
+def bench_paths(app, version):
+    def run():
+        utils.docstring_cache_clear()
+        make_spec(version).plugins[0].register_app(app)
+
+    return measure(run)
+
+
+def bench_components(models, version):
+    def run():
+        spec = make_spec(version)
+        for model in models:
+            spec.components.schema(model.__name__, model=model)
+
+    return measure(run)
+
+
+def bench_to_dict(app, version):
+    spec = make_spec(version)
+    spec.plugins[0].register_app(app)
+    return measure(spec.to_dict)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--depth", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--fanout", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--versions", nargs="+", default=["2.0", "3.0.3"])
+    args = parser.parse_args()
+
+    row = "{:<12} {:<8} {:<16} {:>10} {:>12} {:>12}"
+    print(row.format("benchmark", "oas", "size", "seconds", "peak KiB", "blocks"))
+
+    def report(name, version, size, result):
+        elapsed, peak, blocks = result
+        print(row.format(name, version, size, f"{elapsed:.4f}", peak // 1024, blocks))
+
+    for version in args.versions:
+        for routes in args.routes:
+            app = make_app(routes)
+            report("spec.path", version, routes, bench_paths(app, version))
+            report("to_dict", version, routes, bench_to_dict(app, version))
+        for depth in args.depth:
+            for fanout in args.fanout:
+                models = make_models(depth, fanout)
+                size = f"depth={depth},fan={fanout}"
+                report("components", version, size, bench_components(models, version))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Per-call overhead of views decorated with ``spec_from``.
+
+Run with ``python benchmarks/bench_spec_from.py``.
+"""
+import timeit
+
+from apispec_plugins.utils import spec_from
+
+SPECS = {"responses": {200: {"description": "the pet's name"}}}
+
+
+def view(pet_id, name=None):
+    return pet_id
+
+
+@spec_from(SPECS)
+def wrapped_view(pet_id, name=None):
+    return pet_id
+
+
+@spec_from(SPECS, wrap=False)
+def unwrapped_view(pet_id, name=None):
+    return pet_id
+
+
+def main(number=1_000_000, repeat=5):
+    cases = {
+        "undecorated": view,
+        "wrap=True": wrapped_view,
+        "wrap=False": unwrapped_view,
+    }
+    for label, func in cases.items():
+        timings = timeit.repeat(
+            "func(1, name='Max')", globals={"func": func}, number=number, repeat=repeat
+        )
+        print(f"{label:>12}: {min(timings) / number * 1e9:8.1f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Synthetic Flask apps and pydantic models used by the benchmarks."""
+import itertools
+from typing import List, Optional
+
+from apispec import APISpec
+from flask import Flask
+from flask.views import MethodView
+from pydantic import create_model
+
+from apispec_plugins import FlaskPlugin, PydanticPlugin
+from apispec_plugins.ext.pydantic import BaseModel
+
+
+class Tag(BaseModel):
+    id: int
+    name: str
+
+
+class Owner(BaseModel):
+    id: int
+    name: str
+    email: Optional[str]
+
+
+class Pet(BaseModel):
+    id: Optional[int]
+    name: str
+    owner: Owner
+    tags: List[Tag] = []
+
+
+def function_view(i):
+    def view(pet_id):
+        return str(pet_id)
+
+    view.__name__ = f"pet_{i}"
+    view.__doc__ = f"""Get pet {i}.
+    ---
+    get:
+        description: get pet number {i}
+        parameters:
+            - in: path
+              name: pet_id
+              schema:
+                  type: integer
+        responses:
+            200:
+                description: the pet
+                content:
+                    application/json:
+                        schema: Pet
+            {400 + i % 5}:
+            404:
+    """
+    return view
+
+
+def method_view(i):
+    class PetView(MethodView):
+        def get(self, pet_id):
+            """Get a pet.
+            ---
+            description: get a pet by id
+            responses:
+                200:
+                    description: the pet
+                    content:
+                        application/json:
+                            schema: Pet
+                404:
+            """
+
+        def put(self, pet_id):
+            """Update a pet.
+            ---
+            requestBody:
+                content:
+                    application/json:
+                        schema: Pet
+            responses:
+                200:
+                    description: the updated pet
+                400:
+            """
+
+    return PetView.as_view(f"pet_view_{i}")
+
+
+def make_app(routes):
+    """A Flask app with half function views and half method views."""
+    app = Flask(__name__)
+    for i in range(routes):
+        if i % 2:
+            view = method_view(i)
+            app.add_url_rule(f"/v{i % 3}/pets/{i}/<int:pet_id>", view_func=view)
+        else:
+            app.add_url_rule(f"/pets/{i}/<int:pet_id>", view_func=function_view(i))
+    return app
+
+
+def make_spec(openapi_version="3.0.3"):
+    return APISpec(
+        title="Pet Store",
+        version="1.0.0",
+        openapi_version=openapi_version,
+        plugins=(FlaskPlugin(), PydanticPlugin()),
+    )
+
+
+_graphs = itertools.count()
+
+
+def make_models(depth, fanout):
+    """A graph of models where each model nests ``fanout`` models of the level
+    below, down to ``depth`` levels. Models of a level are shared by all the
+    models of the level above. Returns the models of the top level.
+    """
+    prefix = f"G{next(_graphs)}"
+    level = [
+        create_model(
+            f"{prefix}L0M{i}", __base__=BaseModel, id=(int, ...), name=(str, ...)
+        )
+        for i in range(fanout)
+    ]
+    for depth_level in range(1, depth):
+        fields = {
+            f"child_{i}": (List[model] if i % 2 else model, ...)
+            for i, model in enumerate(level)
+        }
+        level = [
+            create_model(f"{prefix}L{depth_level}M{i}", __base__=BaseModel, **fields)
+            for i in range(fanout)
+        ]
+    return level
@@ -1,16 +1,35 @@
+import importlib
 from importlib import metadata
 
 from .utils import spec_from
-from .ext.pydantic import BaseModel, PydanticPlugin
-from .webframeworks.flask import FlaskPlugin
 from .base.mixin import DataclassSchemaMixin, RegistryMixin
 
 __version__ = metadata.version("apispec-plugins")
 __all__ = (
-    BaseModel,
-    DataclassSchemaMixin,
-    FlaskPlugin,
-    PydanticPlugin,
-    RegistryMixin,
-    spec_from,
+    "BaseModel",
+    "DataclassSchemaMixin",
+    "FlaskPlugin",
+    "PydanticPlugin",
+    "RegistryMixin",
+    "spec_from",
 )
+
+# plugins depending on optional packages are only imported on first access
+_lazy_attributes = {
+    "BaseModel": ".ext.pydantic",
+    "PydanticPlugin": ".ext.pydantic",
+    "FlaskPlugin": ".webframeworks.flask",
+}
+
+
+def __getattr__(name):
+    try:
+        module = importlib.import_module(_lazy_attributes[name], __name__)
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = globals()[name] = getattr(module, name)
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_lazy_attributes})
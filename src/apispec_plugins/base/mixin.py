@@ -1,10 +1,15 @@
+import copy
+import functools
+import weakref
 from dataclasses import MISSING, fields
 from typing import get_args
 
 from apispec import APISpec
-from apispec.ext.marshmallow.openapi import OpenAPIConverter
 from apispec_plugins.base.registry import Registry
 
+# json schemas of dataclasses, by class and by pydantic model or openapi version
+_schemas = weakref.WeakKeyDictionary()
+
 
 class RegistryMixin(Registry):
     def __init_subclass__(cls, **kwargs):
@@ -20,20 +25,27 @@ class DataclassSchemaMixin:
         model = getattr(cls, "__pydantic_model__", None)
         if model:
             Registry.register(model)
-            return model.schema()
+            return cls._cached_schema(model, model.schema)
 
         # or fallback to marshmallow resolver
         return cls.marshmallow_resolver()
 
     @classmethod
     def marshmallow_resolver(cls, openapi_version="2.0"):
-        from apispec.ext.marshmallow.openapi import marshmallow as ma
+        resolver = functools.partial(cls._marshmallow_schema, openapi_version)
+        return cls._cached_schema(openapi_version, resolver)
 
-        openapi_converter = OpenAPIConverter(
-            openapi_version=openapi_version,
-            schema_name_resolver=lambda f: None,
-            spec=APISpec("", "", openapi_version),
-        )
+    @classmethod
+    def _cached_schema(cls, key, resolver):
+        """Resolve the schema of the class once per key, and return a copy."""
+        schemas = _schemas.setdefault(cls, {})
+        if key not in schemas:
+            schemas.setdefault(key, resolver())
+        return copy.deepcopy(schemas[key])
+
+    @classmethod
+    def _marshmallow_schema(cls, openapi_version):
+        from apispec.ext.marshmallow.openapi import marshmallow as ma
 
         def schema_type(t):
             return ma.Schema.TYPE_MAPPING[next(iter(get_args(t)), t)]
@@ -43,4 +55,15 @@ class DataclassSchemaMixin:
             for f in fields(cls)
         }
         schema = ma.Schema.from_dict(schema_dict)
-        return openapi_converter.schema2jsonschema(schema)
+        return _openapi_converter(openapi_version).schema2jsonschema(schema)
+
+
+@functools.lru_cache(maxsize=None)
+def _openapi_converter(openapi_version):
+    from apispec.ext.marshmallow.openapi import OpenAPIConverter
+
+    return OpenAPIConverter(
+        openapi_version=openapi_version,
+        schema_name_resolver=lambda f: None,
+        spec=APISpec("", "", openapi_version),
+    )
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import contextlib
+import time
+from collections import defaultdict
+from typing import Callable, Hashable
+
+__all__ = (
+    "Profiler",
+    "measure",
+    "count",
+)
+
+
+class Profiler:
+    """Collects timings, call counts and cache hit rates of spec builds.
+
+    Plugins given a profiler report what they spend time on by category,
+    e.g. route lookups, docstring parsing or model schema generation, keyed
+    by path, view or model. Each measurement is also passed on to the
+    optional callback as ``callback(category, key, seconds)``.
+    """
+
+    def __init__(self, callback: Callable[[str, str, float], None] | None = None):
+        self.callback = callback
+        self.timings: dict[str, dict[str, list]] = defaultdict(
+            lambda: defaultdict(lambda: [0, 0.0])
+        )
+        self.caches: dict[str, list] = defaultdict(lambda: [0, 0])
+
+    @contextlib.contextmanager
+    def measure(self, category: str, key: Hashable):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, key, time.perf_counter() - start)
+
+    def record(self, category: str, key: Hashable, seconds: float) -> None:
+        key = str(key)
+        entry = self.timings[category][key]
+        entry[0] += 1
+        entry[1] += seconds
+        if self.callback is not None:
+            self.callback(category, key, seconds)
+
+    def count(self, cache: str, hit: bool) -> None:
+        self.caches[cache][0 if hit else 1] += 1
+
+    def report(self) -> dict:
+        """The collected data as a dict of plain values."""
+        from apispec_plugins import utils
+
+        docstrings = utils.docstring_cache_info()
+        caches = {**self.caches, "docstring": [docstrings.hits, docstrings.misses]}
+        return {
+            "timings": {
+                category: {
+                    key: {"calls": calls, "seconds": seconds}
+                    for key, (calls, seconds) in sorted(
+                        entries.items(), key=lambda item: -item[1][1]
+                    )
+                }
+                for category, entries in self.timings.items()
+            },
+            "caches": {
+                name: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else None,
+                }
+                for name, (hits, misses) in caches.items()
+            },
+        }
+
+
+_disabled = contextlib.nullcontext()
+
+
+def measure(profiler: Profiler | None, category: str, key: Hashable):
+    """Context measuring a block with the profiler, if there is one."""
+    if profiler is None:
+        return _disabled
+    return profiler.measure(category, key)
+
+
+def count(profiler: Profiler | None, cache: str, hit: bool) -> None:
+    """Count a cache hit or miss with the profiler, if there is one."""
+    if profiler is not None:
+        profiler.count(cache, hit)
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from typing import TypeVar
+import threading
+import weakref
+from collections.abc import Mapping
+from typing import Iterator, TypeVar
 
 __all__ = (
+    "ClassRegistry",
     "Registry",
     "RegistryError",
 )
@@ -10,27 +14,82 @@ __all__ = (
 T = TypeVar("T")
 
 
+class ClassRegistry(Mapping):
+    """A registry of classes keyed by their qualified name.
+
+    Classes are weakly referenced, so unloaded classes can be garbage
+    collected. Lookups are O(1) either by qualified name or by class name,
+    and a scoped registry falls back on its parent registry, if any.
+
+    Registration is thread-safe and lookups do not take any lock.
+    """
+
+    def __init__(self, parent: ClassRegistry | None = None):
+        self.parent = parent
+        self._classes: weakref.WeakValueDictionary[
+            str, T
+        ] = weakref.WeakValueDictionary()
+        self._names: dict[str, weakref.WeakValueDictionary[str, T]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def qualified_name(record: T) -> str:
+        return f"{record.__module__}.{record.__qualname__}"
+
+    def register(self, record: T):
+        # a class defined again under the same qualified name replaces the
+        # previous one, which is what happens when a module is reloaded
+        qualname = self.qualified_name(record)
+        with self._lock:
+            self._classes[qualname] = record
+            names = self._names.setdefault(
+                record.__name__, weakref.WeakValueDictionary()
+            )
+            names[qualname] = record
+
+    def get_cls(self, classname: str) -> T:
+        record = self._classes.get(classname)
+        if record is None:
+            candidates = list(self._names.get(classname, {}).values())
+            if len(candidates) > 1:
+                raise RegistryError(
+                    f"Class name {classname!r} is ambiguous, use one of the "
+                    f"qualified names {sorted(map(self.qualified_name, candidates))}."
+                )
+            record = next(iter(candidates), None)
+        if record is not None:
+            return record
+        if self.parent is not None:
+            return self.parent.get_cls(classname)
+        raise RegistryError(
+            f"Class with name {classname!r} was not found. You may need "
+            "to import the class."
+        )
+
+    def __getitem__(self, qualname: str) -> T:
+        return self._classes[qualname]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._classes.keys())
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+
 class Registry:
-    _registry: dict[str, T] = {}
+    _registry: ClassRegistry = ClassRegistry()
 
     @classmethod
     def register(cls, record: T):
-        if record.__name__ not in cls._registry:
-            cls._registry[record.__name__] = record
+        cls._registry.register(record)
 
     @classmethod
-    def get_registry(cls):
+    def get_registry(cls) -> ClassRegistry:
         return cls._registry
 
     @classmethod
     def get_cls(cls, classname: str) -> T:
-        try:
-            return cls._registry[classname]
-        except KeyError as error:
-            raise RegistryError(
-                f"Class with name {classname!r} was not found. You may need "
-                "to import the class."
-            ) from error
+        return cls._registry.get_cls(classname)
 
 
 class RegistryError(NameError):
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+from importlib import metadata
+
+from apispec import APISpec
+
+from apispec_plugins import utils
+
+__all__ = ("SpecCache",)
+
+
+class SpecCache:
+    """On-disk cache of the paths and components of built specs.
+
+    Entries are keyed by a fingerprint of everything the spec build depends
+    on, so a matching entry can be loaded instead of running the plugins.
+    Entries are written to a temporary file which is atomically renamed, so
+    concurrent readers and writers never see a partial entry.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = pathlib.Path(directory)
+
+    @staticmethod
+    def fingerprint(*inputs) -> str:
+        """Digest of JSON serializable inputs, along with the library versions."""
+        digest = hashlib.sha256()
+        versions = [metadata.version(d) for d in ("apispec", "apispec-plugins")]
+        for value in (versions, *inputs):
+            digest.update(json.dumps(_canonical(value), default=repr).encode())
+        return digest.hexdigest()
+
+    def entry_path(self, fingerprint: str) -> pathlib.Path:
+        return self.directory / f"spec-{fingerprint}.json"
+
+    def load(self, fingerprint: str) -> dict | None:
+        """Get a cache entry, or None if there is no entry for the fingerprint."""
+        try:
+            with open(self.entry_path(fingerprint), "rb") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def store(self, fingerprint: str, spec: APISpec) -> None:
+        """Store the paths and components of a spec under the fingerprint."""
+        entry = {
+            "paths": spec._paths,
+            "components": utils.spec_components(spec),
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(entry, file)
+            os.replace(tmp_path, self.entry_path(fingerprint))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def apply(self, fingerprint: str, spec: APISpec) -> bool:
+        """Merge a cache entry into a spec, returning whether there was one."""
+        entry = self.load(fingerprint)
+        if entry is None:
+            return False
+        utils.merge_spec(spec, paths=entry["paths"], components=entry["components"])
+        return True
+
+
+def _canonical(value):
+    """Make dicts with keys of mixed types, like response codes, serializable.
+
+    Dicts become lists of key and value pairs sorted by key type and value,
+    so ``200`` and ``"200"`` keys stay distinct.
+    """
+    if isinstance(value, dict):
+        items = [
+            (k if isinstance(k, (str, int, float, bool, type(None))) else repr(k), v)
+            for k, v in value.items()
+        ]
+        items.sort(key=lambda item: (type(item[0]).__name__, str(item[0])))
+        return [[k, _canonical(v)] for k, v in items]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
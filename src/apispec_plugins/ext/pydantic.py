@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import contextlib
-from typing import Any
+import copy
+import hashlib
+import json
+import threading
+import typing
+import weakref
+from typing import Any, Iterable, Mapping
 
 from apispec import BasePlugin, APISpec
-from apispec.exceptions import APISpecError, DuplicateComponentNameError
+from apispec.exceptions import APISpecError
+from apispec.utils import build_reference
+from apispec_plugins.base import profiling
 from apispec_plugins.base.mixin import RegistryMixin
-from pydantic import BaseModel as PBaseModel
+from apispec_plugins.base.registry import ClassRegistry, Registry, RegistryError
+from pydantic import BaseModel as PBaseModel, ValidationError
 
 
 class BaseModel(PBaseModel, RegistryMixin):
@@ -14,14 +23,46 @@ class BaseModel(PBaseModel, RegistryMixin):
 
 
 class PydanticPlugin(BasePlugin):
-    def __init__(self):
+    """APISpec plugin for pydantic models.
+
+    Models are looked up by name in the plugin registry. By default, it is a
+    registry scoped to the plugin which falls back on the global registry of
+    ``RegistryMixin`` classes. An optional profiler records the time spent
+    resolving each path and generating each model schema.
+
+    The models of the parameters and bodies of operations are compiled into a
+    :class:`RequestValidator` per path and method, found in ``validators``.
+
+    Parameters given as a model are expanded into one parameter per field.
+    With ``parameter_components``, each of them is registered once as a
+    parameter component and operations reference it.
+    """
+
+    def __init__(
+        self,
+        registry: ClassRegistry | None = None,
+        profiler: profiling.Profiler | None = None,
+        parameter_components: bool = False,
+    ):
         self.spec = None
         self.resolver = None
+        self.profiler = profiler
+        self.parameter_components = parameter_components
+        if registry is None:
+            registry = ClassRegistry(parent=Registry.get_registry())
+        self.registry = registry
+        self.dependencies: dict[str, set[str]] = {}
+        self.validators: dict[tuple[str, str], RequestValidator] = {}
 
     def init_spec(self, spec: APISpec):
         super().init_spec(spec)
         self.spec = spec
-        self.resolver = OASResolver(spec=spec)
+        self.resolver = OASResolver(
+            spec=spec,
+            registry=self.registry,
+            profiler=self.profiler,
+            parameter_components=self.parameter_components,
+        )
 
     def schema_helper(self, name: str, definition: dict, **kwargs: Any) -> dict | None:
         model: BaseModel | None = kwargs.pop("model", None)
@@ -31,7 +72,11 @@ class PydanticPlugin(BasePlugin):
         return self.resolver.resolve_schema(model, use_ref=False)
 
     def parameter_helper(self, parameter: dict, **kwargs: Any) -> dict | None:
-        self.resolver.resolve_parameters([parameter])
+        # a parameter component given as a model keeps the model schema
+        if "schema" in parameter and not isinstance(parameter["schema"], dict):
+            self.resolver.resolve_schema(parameter, use_ref=False)
+        else:
+            self.resolver.resolve_parameters([parameter])
         return parameter
 
     def response_helper(self, response: dict, **kwargs: Any) -> dict | None:
@@ -48,13 +93,114 @@ class PydanticPlugin(BasePlugin):
         operations: dict | None = None,
         **kwargs: Any,
     ) -> None:
-        for operation in (operations or {}).values():
-            self.resolver.resolve_operation(operation)
+        with self.resolver.collect_models() as models, profiling.measure(
+            self.profiler, "resolve", path
+        ):
+            for method, operation in (operations or {}).items():
+                # models are picked before the operation is resolved to schemas
+                request_models = self.resolver.request_models(operation)
+                self.resolver.resolve_operation(operation)
+                if path and request_models:
+                    validator = RequestValidator(request_models)
+                    self.validators[(path, method)] = validator
+        if path:
+            self.dependencies.setdefault(path, set()).update(models)
+
+    def fingerprint(self) -> dict[str, dict]:
+        """The schemas of the models known to the plugin, by qualified name."""
+        registries, registry = [], self.registry
+        while registry is not None:
+            registries.append(registry)
+            registry = registry.parent
+        models = {}
+        for registry in reversed(registries):
+            models.update(registry.items())
+        return {
+            qualname: self.resolver.to_schema(model)
+            for qualname, model in sorted(models.items())
+            if isinstance(model, type) and issubclass(model, BaseModel)
+        }
+
+    def invalidate(self, models: Iterable[type[BaseModel] | str] = ()) -> set[str]:
+        """Register changed models again and get the paths depending on them.
+
+        The schema components of the models are replaced, the nested
+        definitions of the new models are hoisted and the paths that resolved
+        any of the models are returned, to be registered again. Parameter
+        components of the models are removed, for these paths to register
+        them again.
+        """
+        names = set()
+        for model in models:
+            if not isinstance(model, str):
+                self.registry.register(model)
+            names.add(model if isinstance(model, str) else model.__name__)
+
+        registered = set()
+        for name in names:
+            self.resolver.clear_cache(name)
+            for component_id in self.resolver.parameter_ids.pop(name, ()):
+                self.spec.components.parameters.pop(component_id, None)
+            if self.spec.components.schemas.pop(name, None) is not None:
+                registered.add(name)
+        for name in sorted(registered):
+            with contextlib.suppress(RegistryError):
+                self.resolver.register_model(self.registry.get_cls(name))
+
+        return {path for path, deps in self.dependencies.items() if deps & names}
+
+    def merge_dependencies(self, dependencies: dict[str, set[str]]) -> None:
+        for path, names in dependencies.items():
+            self.dependencies.setdefault(path, set()).update(names)
+
+    def clear_cache(self, model: type[BaseModel] | str | None = None) -> None:
+        """Drop cached model schemas, e.g. when models are redefined on reload."""
+        self.resolver.clear_cache(model)
+
+    def validator(self, path: str, method: str) -> RequestValidator | None:
+        """The request validator of an operation, if it has any models."""
+        return self.validators.get((path, method.lower()))
 
 
 class OASResolver:
-    def __init__(self, spec: APISpec):
+    """Resolves pydantic models referenced in the specs of a spec.
+
+    Component registration is serialized with a lock, so models shared by
+    several threads are registered once. The schema cache is read without
+    locking and cached schemas are never mutated.
+    """
+
+    def __init__(
+        self,
+        spec: APISpec,
+        registry: ClassRegistry | None = None,
+        profiler: profiling.Profiler | None = None,
+        parameter_components: bool = False,
+    ):
         self.spec = spec
+        self.registry = registry if registry is not None else Registry.get_registry()
+        self.profiler = profiler
+        self.parameter_components = parameter_components
+        # ids of the parameter components registered for each model name
+        self.parameter_ids: dict[str, list[str]] = {}
+        # caches by model, weakly, then by ref template or parameter location
+        self._schemas: weakref.WeakKeyDictionary[
+            type[BaseModel], dict[str | None, dict]
+        ] = weakref.WeakKeyDictionary()
+        self._parameters: weakref.WeakKeyDictionary[
+            type[BaseModel], dict[str, list]
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def collect_models(self):
+        """Collect the names of the models resolved within the context."""
+        self._local.models = models = set()
+        try:
+            yield models
+        finally:
+            self._local.models = None
 
     def resolve_schema_props(self, props: dict, use_ref: bool) -> None:
         if "schema" in props:
@@ -88,16 +234,13 @@ class OASResolver:
                 self.register_model(model)
                 return self.resolve_schema_name(schema)
             else:
-                return self.to_schema(model)
+                return self.model_schema(model)
 
     def resolve_parameters(self, parameters: list[dict]) -> None:
         params = []
         for parameter in parameters:
             if "schema" in parameter and not isinstance(parameter["schema"], dict):
-                self.resolve_schema(parameter, use_ref=False)
-                for name, props in parameter["schema"]["properties"].items():
-                    param = {"in": parameter["in"], "name": name, "schema": props}
-                    params.append(param)
+                params.extend(self.expand_parameters(parameter))
             elif "content" in parameter:
                 for media_type in parameter["content"].values():
                     self.resolve_schema(media_type)
@@ -106,6 +249,78 @@ class OASResolver:
                 params.append(parameter)
         parameters[:] = params[:]
 
+    def expand_parameters(self, parameter: dict) -> list[dict | str]:
+        """The parameters of the fields of a parameter given as a model.
+
+        The expansion is computed once per model and location. Parameters are
+        returned inline, or as the ids of their components if the resolver
+        registers parameter components.
+        """
+        model = self.resolve_schema_instance(parameter["schema"])
+        if model is None:
+            raise APISpecError(
+                f"Schema resolver returned None for schema {parameter['schema']!r}."
+            )
+        expansions = self._parameters.setdefault(model, {})
+        expanded = expansions.get(parameter["in"])
+        profiling.count(self.profiler, "parameters", expanded is not None)
+        if expanded is None:
+            schema = self.model_schema(model)
+            expanded = [
+                {"in": parameter["in"], "name": name, "schema": props}
+                for name, props in schema["properties"].items()
+            ]
+            if self.parameter_components:
+                expanded = [self.register_parameter(model, param) for param in expanded]
+            expanded = expansions.setdefault(parameter["in"], expanded)
+        # inline parameters are mutated by the spec, component ids are not
+        return copy.deepcopy(expanded)
+
+    def register_parameter(self, model: type[BaseModel], parameter: dict) -> str:
+        """Register a parameter of a model as a component and get its id.
+
+        Models of different modules may share a name, so a parameter differing
+        from the component registered under its id gets an id suffixed with
+        its hash instead.
+        """
+        component_id = f"{model.__name__}.{parameter['in']}.{parameter['name']}"
+        with self._lock:
+            registered = self.spec.components.parameters.get(component_id)
+            # the spec adds keys to the components, e.g. required path parameters
+            if registered is not None and not registered.items() >= parameter.items():
+                component_id = f"{component_id}_{_digest(parameter)}"
+            if component_id not in self.spec.components.parameters:
+                self.spec.components.parameter(
+                    component_id, parameter["in"], component=parameter
+                )
+                self.parameter_ids.setdefault(model.__name__, []).append(component_id)
+        return component_id
+
+    def request_models(self, operation: dict) -> dict[str, type[BaseModel]]:
+        """The models of the parameters and body of an unresolved operation.
+
+        Models are returned by parameter location, with the body of OAS 2
+        and the request body of OAS 3 both found under ``body``.
+        """
+        models = {}
+        if not isinstance(operation, dict):
+            return models
+        for parameter in operation.get("parameters", []):
+            schema = isinstance(parameter, dict) and parameter.get("schema")
+            if schema and not isinstance(schema, dict):
+                models[parameter["in"]] = self.resolve_schema_instance(schema)
+        if self.spec.openapi_version.major >= 3:
+            content = operation.get("requestBody", {}).get("content", {})
+            for media_type in content.values():
+                schema = media_type.get("schema")
+                if schema and not isinstance(schema, dict):
+                    models["body"] = self.resolve_schema_instance(schema)
+        return {
+            location: model
+            for location, model in models.items()
+            if location in RequestValidator.locations
+        }
+
     def resolve_response(self, response: dict) -> None:
         if self.spec.openapi_version.major < 3:
             if "schema" in response:
@@ -140,26 +355,131 @@ class OASResolver:
                 self.resolve_operation(operation)
 
     def register_model(self, model: BaseModel | type[BaseModel]) -> None:
-        # suppress duplicate model registration
-        with contextlib.suppress(DuplicateComponentNameError):
-            self.spec.components.schema(component_id=model.__name__, model=model)
+        # skip duplicate model registration
+        with self._lock:
+            if model.__name__ not in self.spec.components.schemas:
+                with profiling.measure(self.profiler, "register", model.__name__):
+                    self.spec.components.schema(
+                        component_id=model.__name__, model=model
+                    )
 
-    @staticmethod
-    def to_schema(model: BaseModel | type[BaseModel]) -> dict:
-        """The pydantic model conversion to OAS is performed by pydentic itself."""
-        return model.schema()
+    def model_schema(self, model: type[BaseModel]) -> dict:
+        """Get the schema of a model with its nested definitions hoisted.
+
+        Sub-models are registered once as schema components and referenced
+        instead of being embedded in the schema of every model using them.
+        """
+        ref_template = build_reference(
+            "schema", self.spec.openapi_version.major, "{model}"
+        )["$ref"]
+        schema = self.to_schema(model, ref_template=ref_template)
+        definitions = {**schema.pop("definitions", {}), **schema.pop("$defs", {})}
+
+        # self-referencing models are a reference to their own definition, bare
+        # with pydantic v1 and in an allOf with pydantic v2. The definition of
+        # the model itself is never registered here, as it is its schema.
+        definition = definitions.pop(model.__name__, None)
+        own_ref = {"$ref": ref_template.format(model=model.__name__)}
+        if definition is not None and schema in (own_ref, {"allOf": [own_ref]}):
+            schema = definition
+
+        with self._lock:
+            renames = self.definition_ids(definitions, ref_template)
+            if renames:
+                refs = {
+                    ref_template.format(model=name): ref_template.format(model=new)
+                    for name, new in renames.items()
+                }
+                _rename_refs(schema, refs)
+                _rename_refs(definitions, refs)
+            for name, definition in definitions.items():
+                self.register_definition(renames.get(name, name), definition)
+        return schema
+
+    def definition_ids(
+        self, definitions: dict[str, dict], ref_template: str
+    ) -> dict[str, str]:
+        """The new component ids of definitions clashing with a component.
+
+        Sub-models of different modules may share a name, so a definition
+        differing from the component registered under its name gets an id
+        suffixed with its hash instead. Definitions referencing a renamed one
+        differ in turn once their references are rewritten.
+        """
+        schemas = self.spec.components.schemas
+        definitions = copy.deepcopy(definitions)
+        renames = {}
+        while True:
+            clashes = {
+                name: f"{name}_{_digest(definition)}"
+                for name, definition in definitions.items()
+                if name not in renames and schemas.get(name, definition) != definition
+            }
+            if not clashes:
+                return renames
+            renames.update(clashes)
+            _rename_refs(
+                definitions,
+                {
+                    ref_template.format(model=name): ref_template.format(model=new)
+                    for name, new in clashes.items()
+                },
+            )
+
+    def register_definition(self, name: str, definition: dict) -> None:
+        # definitions shared by several models are registered once
+        with self._lock:
+            if name not in self.spec.components.schemas:
+                self.spec.components.schema(component_id=name, component=definition)
+
+    def to_schema(
+        self, model: BaseModel | type[BaseModel], ref_template: str | None = None
+    ) -> dict:
+        """The pydantic model conversion to OAS is performed by pydentic itself.
+
+        Schemas are cached per model and reference template and a copy is
+        returned, so the cached schemas are never mutated.
+        """
+        if isinstance(model, BaseModel):
+            model = model.__class__
+        schemas = self._schemas.setdefault(model, {})
+        schema = schemas.get(ref_template)
+        profiling.count(self.profiler, "model schema", schema is not None)
+        if schema is None:
+            kwargs = {"ref_template": ref_template} if ref_template else {}
+            with profiling.measure(self.profiler, "model.schema", model.__name__):
+                schema = schemas.setdefault(ref_template, model.schema(**kwargs))
+        return copy.deepcopy(schema)
+
+    def clear_cache(self, model: type[BaseModel] | str | None = None) -> None:
+        """Drop the cached schemas of a model, matched by name, or of all models."""
+        if model is None:
+            self._schemas.clear()
+            self._parameters.clear()
+            return
+        name = model if isinstance(model, str) else model.__name__
+        for cache in (self._schemas, self._parameters):
+            for key in [key for key in cache.keys() if key.__name__ == name]:
+                cache.pop(key, None)
 
-    @classmethod
     def resolve_schema_instance(
-        cls, schema: str | BaseModel | type[BaseModel] | None
+        self, schema: str | BaseModel | type[BaseModel] | None
     ) -> type[BaseModel] | None:
         if isinstance(schema, type) and issubclass(schema, BaseModel):
-            return schema
+            self.registry.register(schema)
+            model = schema
         elif isinstance(schema, BaseModel):
-            return schema.__class__
+            self.registry.register(schema.__class__)
+            model = schema.__class__
         elif isinstance(schema, str):
-            return BaseModel.get_cls(schema)
-        return None
+            model = self.registry.get_cls(schema)
+        else:
+            return None
+
+        models = getattr(self._local, "models", None)
+        if models is not None:
+            models.add(model.__name__)
+        return model
 
     @classmethod
     def resolve_schema_name(cls, schema: str | BaseModel | type[BaseModel]) -> str:
@@ -169,3 +489,163 @@ class OASResolver:
             return schema.__class__.__name__
         elif isinstance(schema, type(BaseModel)):
             return schema.__name__
+
+
+class RequestValidationError(ValueError):
+    """Raised when a request doesn't match the models of its operation.
+
+    ``errors`` are the pydantic errors of every location, with the location
+    prepended to the ``loc`` of each error.
+    """
+
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+class RequestValidator:
+    """Validates the parameters and body of the requests to an operation.
+
+    The fields of the models are looked up once, when the validator is
+    compiled, so validating a request is a single call per model. Query
+    values are lists of strings, as several may be given for a name, or a
+    multi-valued mapping with a ``getlist`` method.
+    """
+
+    locations = ("path", "query", "header", "cookie", "body")
+
+    def __init__(self, models: dict[str, type[BaseModel]]):
+        self.models = models
+        self._steps = []
+        for position, location in enumerate(self.locations):
+            model = models.get(location)
+            if model is None:
+                continue
+            extract = getattr(self, f"_{location}_values", None)
+            if extract is not None:
+                extract = extract(model)
+            # parse_obj is deprecated, and warns on every call, with pydantic v2
+            parse = getattr(model, "model_validate", model.parse_obj)
+            self._steps.append((position, location, parse, extract))
+
+    def __call__(
+        self,
+        path: Mapping | None = None,
+        query: Mapping[str, list] | None = None,
+        header: Mapping | None = None,
+        cookie: Mapping | None = None,
+        body: Any = None,
+    ) -> dict[str, BaseModel]:
+        """Validate the values of a request by location.
+
+        :return: the model instances by location
+        :raises RequestValidationError: if any location is not valid
+        """
+        sources = (path, query, header, cookie, body)
+        validated, errors = {}, None
+        for position, location, parse, extract in self._steps:
+            value = sources[position]
+            if extract is not None:
+                value = extract(value or {})
+            elif value is None and position < 4:
+                value = {}
+            try:
+                validated[location] = parse(value)
+            except ValidationError as error:
+                errors = errors or []
+                errors.extend(
+                    {
+                        "loc": (location, *e["loc"]),
+                        "msg": e["msg"],
+                        "type": e["type"],
+                    }
+                    for e in error.errors()
+                )
+        if errors:
+            raise RequestValidationError(errors)
+        return validated
+
+    @staticmethod
+    def _fields(model: type[BaseModel]) -> list[tuple[str, Any]]:
+        """The aliases and annotations of the fields of a model."""
+        if hasattr(model, "model_fields"):
+            return [
+                (field.alias or name, field.annotation)
+                for name, field in model.model_fields.items()
+            ]
+        return [(field.alias, field.outer_type_) for field in model.__fields__.values()]
+
+    @classmethod
+    def _query_values(cls, model: type[BaseModel]):
+        # sequence fields take every value of a name, other fields the first
+        fields = [
+            (alias, _is_sequence(annotation))
+            for alias, annotation in cls._fields(model)
+        ]
+
+        def extract(query):
+            getlist = getattr(query, "getlist", query.get)
+            values = {}
+            for alias, many in fields:
+                items = getlist(alias)
+                if items:
+                    values[alias] = items if many else items[0]
+            return values
+
+        return extract
+
+    @classmethod
+    def _header_values(cls, model: type[BaseModel]):
+        # snake case fields match the hyphenated header names, tried first
+        fields = [(alias, alias.replace("_", "-")) for alias, _ in cls._fields(model)]
+
+        def extract(header):
+            values = {}
+            for alias, name in fields:
+                value = header.get(name)
+                if value is None and name != alias:
+                    value = header.get(alias)
+                if value is not None:
+                    values[alias] = value
+            return values
+
+        return extract
+
+    @classmethod
+    def _cookie_values(cls, model: type[BaseModel]):
+        # cookie mappings may hold several values per name, the first is kept
+        aliases = [alias for alias, _ in cls._fields(model)]
+
+        def extract(cookie):
+            values = {}
+            for alias in aliases:
+                value = cookie.get(alias)
+                if value is not None:
+                    values[alias] = value
+            return values
+
+        return extract
+
+
+def _digest(definition: dict) -> str:
+    key = json.dumps(definition, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def _rename_refs(value: Any, refs: dict[str, str]) -> None:
+    """Rewrite the references of a schema in place."""
+    if isinstance(value, dict):
+        if value.get("$ref") in refs:
+            value["$ref"] = refs[value["$ref"]]
+        for item in value.values():
+            _rename_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            _rename_refs(item, refs)
+
+
+def _is_sequence(annotation: Any) -> bool:
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        return any(_is_sequence(arg) for arg in typing.get_args(annotation))
+    return origin in (list, set, frozenset, tuple)
@@ -1,31 +1,57 @@
+import ast
+import copy
+import collections
 import functools
+import hashlib
+import json
 import re
 import typing
 import urllib.parse
 from dataclasses import asdict
 
 from apispec import yaml_utils
-from apispec_plugins.base import types
+from apispec.utils import build_reference
+
+if typing.TYPE_CHECKING:
+    from apispec_plugins.base import types
 
 
 __all__ = (
     "spec_from",
     "load_method_specs",
     "load_specs_from_docstring",
+    "load_yaml_from_docstring",
+    "load_operations_from_docstring",
+    "docstring_cache_info",
+    "docstring_cache_clear",
     "path_parser",
+    "path_parameters",
+    "path_cache_info",
+    "path_cache_clear",
+    "spec_components",
+    "merge_spec",
+    "deduplicate_schemas",
+    "iter_spec_json",
+    "iter_spec_yaml",
+    "write_spec",
     "base_template",
 )
 
 
-def spec_from(specs):
-    def decorator(func):
+def spec_from(specs, wrap=True):
+    """Set the specs of a view on top of the ones in its docstring.
 
-        docstring_specs = load_specs_from_docstring(func.__doc__)
+    :param specs: specs taking precedence over the docstring specs
+    :param wrap: whether to wrap the view, otherwise the specs are attached to
+        the view itself and it is returned unchanged, adding no call overhead
+    """
 
-        # merge specs prioritizing decorator specs
-        docstring_specs.update(specs)
+    def decorator(func):
 
-        func.specs = docstring_specs
+        # docstring specs are only parsed once the specs are first requested
+        func.spec_from = specs
+        if not wrap:
+            return func
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -37,8 +63,18 @@ def spec_from(specs):
 
 
 def load_method_specs(method):
+    """Get the specs of a view method, set by ``spec_from`` or in its docstring."""
+    method = getattr(method, "__func__", method)
+    if not hasattr(method, "specs") and hasattr(method, "spec_from"):
+
+        # merge specs prioritizing decorator specs
+        specs = load_specs_from_docstring(method.__doc__)
+        specs.update(method.spec_from)
+
+        method.specs = specs
+
     if hasattr(method, "specs"):
-        return method.specs
+        return copy.deepcopy(method.specs)
     else:
         return load_specs_from_docstring(method.__doc__)
 
@@ -53,7 +89,7 @@ def load_specs_from_docstring(docstring):
     if not docstring:
         return {}
 
-    specs = yaml_utils.load_yaml_from_docstring(docstring)
+    specs = load_yaml_from_docstring(docstring)
 
     # extract summary out of docstring and make it part of specs
     summary = docstring.split(yaml_sep)[0] if yaml_sep in docstring else docstring
@@ -67,24 +103,393 @@ def load_specs_from_docstring(docstring):
     return specs
 
 
+@functools.lru_cache(maxsize=1024)
+def _parse_docstring(docstring):
+    return yaml_utils.load_yaml_from_docstring(docstring)
+
+
+def load_yaml_from_docstring(docstring):
+    """Get the YAML specs of a docstring, parsing each distinct docstring once.
+
+    Parsed specs are memoized by docstring content in a bounded cache. A deep
+    copy is returned so callers are free to mutate the result.
+    """
+    if not docstring:
+        return {}
+    return copy.deepcopy(_parse_docstring(docstring))
+
+
+def load_operations_from_docstring(docstring):
+    """Get the operations and extensions specs out of a docstring."""
+    return {
+        key: val
+        for key, val in load_yaml_from_docstring(docstring).items()
+        if key in yaml_utils.PATH_KEYS or key.startswith("x-")
+    }
+
+
+def docstring_cache_info():
+    """Hit and miss counters of the docstring specs cache."""
+    return _parse_docstring.cache_info()
+
+
+def docstring_cache_clear():
+    """Empty the docstring specs cache."""
+    _parse_docstring.cache_clear()
+
+
+RULE_ARGUMENT = re.compile(r"<(?:([^<>]*):)?([^<>]*)>")
+
+
 def path_parser(path, **kwargs):
     """Make rule path OpenAPI specs compliant."""
-    reg = r"<([^<>]*:)?([^<>]*)>"
-    parsed = re.sub(reg, r"{\2}", path)
+    return _translate_rule(path, kwargs.get("base_path", ""))
+
+
+def path_parameters(path, openapi_major_version=3):
+    """Typed path parameters of a rule, from the converters of its arguments.
+
+    ``int`` and ``float`` arguments are integers and numbers, ``uuid`` ones
+    strings of the uuid format, ``any`` ones enums and others strings.
+    """
+    parameters = []
+    for name, schema in _rule_arguments(path):
+        parameter = {"in": "path", "name": name, "required": True}
+        if openapi_major_version < 3:
+            parameter.update(copy.deepcopy(schema))
+        else:
+            parameter["schema"] = copy.deepcopy(schema)
+        parameters.append(parameter)
+    return parameters
+
+
+def path_cache_info():
+    """Hit and miss counters of the rule translation cache."""
+    return _translate_rule.cache_info()
+
+
+def path_cache_clear():
+    """Empty the rule translation and rule arguments caches."""
+    _translate_rule.cache_clear()
+    _rule_arguments.cache_clear()
+
 
-    base_path = kwargs.get("base_path", "")
+# rules are static, so each one is translated once
+@functools.lru_cache(maxsize=None)
+def _translate_rule(path, base_path):
+    parsed = RULE_ARGUMENT.sub(r"{\2}", path)
     parsed = parsed[len(base_path) :] if parsed.startswith(base_path) else parsed
-    parsed = urllib.parse.urljoin("/", parsed)
+    return urllib.parse.urljoin("/", parsed)
+
+
+@functools.lru_cache(maxsize=None)
+def _rule_arguments(path):
+    arguments = []
+    for converter, name in RULE_ARGUMENT.findall(path):
+        converter, _, args = converter.partition("(")
+        args, kwargs = _converter_args(args[:-1] if args.endswith(")") else args)
+        arguments.append((name, _converter_schema(converter.strip(), args, kwargs)))
+    return tuple(arguments)
+
+
+def _converter_args(args):
+    """Positional and keyword arguments of a rule converter."""
+    positional, keywords = [], {}
+    for arg in filter(None, (arg.strip() for arg in args.split(","))):
+        key, sep, value = arg.partition("=")
+        if sep:
+            keywords[key.strip()] = _converter_value(value.strip())
+        else:
+            positional.append(_converter_value(arg))
+    return positional, keywords
+
+
+def _converter_value(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def _converter_schema(converter, args, kwargs):
+    if converter in ("int", "float"):
+        schema = {"type": "integer" if converter == "int" else "number"}
+        # werkzeug number converters only match positive values unless signed
+        minimum = kwargs.get("min", None if kwargs.get("signed") else 0)
+        if minimum is not None:
+            schema["minimum"] = minimum
+        if kwargs.get("max") is not None:
+            schema["maximum"] = kwargs["max"]
+    elif converter == "uuid":
+        schema = {"type": "string", "format": "uuid"}
+    elif converter == "any":
+        schema = {"type": "string", "enum": [str(arg) for arg in args]}
+    else:
+        schema = {"type": "string"}
+        if converter in ("", "default", "string"):
+            length = kwargs.get("length")
+            for keyword, key in (
+                ("minlength", "minLength"),
+                ("maxlength", "maxLength"),
+            ):
+                if kwargs.get(keyword, length) is not None:
+                    schema[key] = kwargs.get(keyword, length)
+    return schema
+
+
+COMPONENT_SECTIONS = (
+    "schemas",
+    "responses",
+    "parameters",
+    "headers",
+    "examples",
+    "security_schemes",
+)
+
+
+def spec_components(spec):
+    """Get the component sections of a spec, keyed by section name."""
+    return {
+        section: getattr(spec.components, section) for section in COMPONENT_SECTIONS
+    }
+
+
+def merge_spec(spec, paths=None, components=None):
+    """Merge paths and components into a spec.
+
+    Paths are merged the way ``APISpec.path`` does it. Components already in
+    the spec are kept, and new ones are added in the given order.
+    """
+    for path, operations in (paths or {}).items():
+        spec._paths.setdefault(path, {}).update(operations)
+    for section, items in (components or {}).items():
+        registered = getattr(spec.components, section)
+        for component_id, component in items.items():
+            registered.setdefault(component_id, component)
+
+
+def deduplicate_schemas(spec, min_size=128):
+    """Register the schemas repeated across a spec once, as components.
+
+    Schemas are compared by their canonical JSON, and copies of at least
+    ``min_size`` characters are replaced with a reference to a single schema
+    component: an identical component if the spec has one, else a new one
+    named after the schema title, or its hash if the title is taken. Larger
+    schemas come first, so copies nested in a deduplicated schema only count
+    once.
+
+    :return: the number of copies replaced, by component name
+    """
+    schemas = spec.components.schemas
+    # canonical keys by schema id, the schemas being kept alive meanwhile
+    keys, nodes = {}, []
+    first, counts = {}, collections.Counter()
+
+    def record(schema, count=True):
+        key = keys[id(schema)] = _canonical(schema)
+        nodes.append(schema)
+        if count:
+            first.setdefault(key, schema)
+            counts[key] += 1
+        for container, slot in _subschemas(schema):
+            record(container[slot], count)
+
+    for schema in schemas.values():
+        record(schema)
+    roots = collections.Counter(keys[id(schema)] for schema in schemas.values())
+    root_names = {keys[id(schema)]: name for name, schema in schemas.items()}
+    for container, slot in _schema_slots(spec):
+        record(container[slot])
+
+    def descendants(schema):
+        for container, slot in _subschemas(schema):
+            yield keys[id(container[slot])]
+            yield from descendants(container[slot])
+
+    names = {}
+    for key in sorted(counts, key=len, reverse=True):
+        if len(key) < min_size:
+            break
+        # component roots are kept, other copies become references
+        copies = counts[key] - max(roots[key], 1)
+        if copies < 1:
+            continue
+        for descendant in descendants(first[key]):
+            counts[descendant] -= copies
+        name = root_names.get(key)
+        if name is None:
+            name = first[key].get("title")
+            if not isinstance(name, str) or name in schemas:
+                name = f"Schema{hashlib.sha256(key.encode()).hexdigest()[:8]}"
+            spec.components.schema(name, component=copy.deepcopy(first[key]))
+            record(schemas[name], count=False)
+        names[key] = name
+
+    replaced = dict.fromkeys(names.values(), 0)
+
+    def deduplicate(container, slot):
+        schema = container[slot]
+        name = names.get(keys[id(schema)])
+        if name is not None:
+            ref = build_reference("schema", spec.openapi_version.major, name)
+            container[slot] = ref
+            replaced[name] += 1
+        else:
+            for subschema in _subschemas(schema):
+                deduplicate(*subschema)
+
+    # component roots, new ones included, only have their subschemas replaced
+    for schema in list(schemas.values()):
+        for subschema in _subschemas(schema):
+            deduplicate(*subschema)
+    for container, slot in _schema_slots(spec):
+        deduplicate(container, slot)
+    return replaced
+
+
+def _canonical(schema):
+    return json.dumps(schema, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _subschemas(schema):
+    """Slots of the direct subschemas of a schema, as container and key."""
+    for keyword in ("properties", "patternProperties"):
+        subschemas = schema.get(keyword)
+        if isinstance(subschemas, dict):
+            for name, subschema in subschemas.items():
+                if isinstance(subschema, dict):
+                    yield subschemas, name
+    for keyword in ("items", "additionalProperties", "not"):
+        if isinstance(schema.get(keyword), dict):
+            yield schema, keyword
+    for keyword in ("items", "allOf", "anyOf", "oneOf"):
+        subschemas = schema.get(keyword)
+        if isinstance(subschemas, list):
+            for index, subschema in enumerate(subschemas):
+                if isinstance(subschema, dict):
+                    yield subschemas, index
+
+
+def _schema_slots(spec):
+    """Slots of the schemas of paths and non schema components."""
+
+    def content(media_types):
+        for media_type in (media_types or {}).values():
+            if isinstance(media_type, dict) and isinstance(
+                media_type.get("schema"), dict
+            ):
+                yield media_type, "schema"
+
+    def parameter(obj):
+        if isinstance(obj, dict):
+            if isinstance(obj.get("schema"), dict):
+                yield obj, "schema"
+            yield from content(obj.get("content"))
+
+    def response(obj):
+        yield from parameter(obj)
+        if isinstance(obj, dict):
+            for header in (obj.get("headers") or {}).values():
+                yield from parameter(header)
+
+    def path_item(item):
+        for obj in item.get("parameters", ()):
+            yield from parameter(obj)
+        for operation in item.values():
+            if not isinstance(operation, dict):
+                continue
+            for obj in operation.get("parameters", ()):
+                yield from parameter(obj)
+            for obj in (operation.get("responses") or {}).values():
+                yield from response(obj)
+            yield from parameter(operation.get("requestBody"))
+            for callback in (operation.get("callbacks") or {}).values():
+                for callback_item in callback.values():
+                    yield from path_item(callback_item)
+
+    slots = []
+    for item in spec._paths.values():
+        slots.extend(path_item(item))
+    for obj in spec.components.parameters.values():
+        slots.extend(parameter(obj))
+    for obj in spec.components.headers.values():
+        slots.extend(parameter(obj))
+    for obj in spec.components.responses.values():
+        slots.extend(response(obj))
+    return slots
+
+
+def _buffered(chunks, chunk_size):
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _iter_json(value, depth):
+    if depth == 0 or not isinstance(value, dict) or not value:
+        yield json.dumps(value)
+        return
+    separator = "{"
+    for key, item in value.items():
+        yield f"{separator}{json.dumps(str(key))}: "
+        yield from _iter_json(item, depth - 1)
+        separator = ", "
+    yield "}"
+
+
+def iter_spec_json(spec, chunk_size=65536):
+    """Serialize a spec to JSON in chunks, without building the whole document.
+
+    The paths and components are serialized one at a time, so the memory
+    used is bounded by the largest path item or component. The output is the
+    same as ``json.dumps(spec.to_dict())``.
+    """
+    # root fields, sections and section items are written one by one
+    yield from _buffered(_iter_json(spec.to_dict(), depth=3), chunk_size)
+
+
+def _iter_yaml(value, depth, indent=""):
+    from apispec.yaml_utils import dict_to_yaml
+
+    for key, item in value.items():
+        # keys down to the streamed depth are plain spec field names
+        if depth > 1 and isinstance(item, dict) and item:
+            yield f"{indent}{key}:\n"
+            yield from _iter_yaml(item, depth - 1, indent=f"{indent}  ")
+        else:
+            text = dict_to_yaml({key: item})
+            yield "".join(f"{indent}{line}" for line in text.splitlines(True))
+
+
+def iter_spec_yaml(spec, chunk_size=65536):
+    """Serialize a spec to YAML in chunks, one path or component at a time."""
+    chunks = (
+        chunk
+        for key, value in spec.to_dict().items()
+        for chunk in _iter_yaml({key: value}, depth=3 if key == "components" else 2)
+    )
+    yield from _buffered(chunks, chunk_size)
+
 
-    return parsed
+def write_spec(spec, file, fmt="json", chunk_size=65536):
+    """Write a spec to a text file object in chunks, in JSON or YAML."""
+    chunks = iter_spec_json if fmt == "json" else iter_spec_yaml
+    for chunk in chunks(spec, chunk_size=chunk_size):
+        file.write(chunk)
 
 
 def base_template(
     openapi_version: str,
     info: dict = None,
-    servers: typing.List[types.Server] = (),
-    auths: typing.List[types.AuthSchemes.BasicAuth] = (),
-    tags: typing.List[types.Tag] = (),
+    servers: "typing.List[types.Server]" = (),
+    auths: "typing.List[types.AuthSchemes.BasicAuth]" = (),
+    tags: "typing.List[types.Tag]" = (),
 ):
     """Provide a base OpenAPI template."""
 
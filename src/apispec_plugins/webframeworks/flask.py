@@ -1,89 +1,846 @@
+from __future__ import annotations
+
+import copy
+import gzip
+import hashlib
 import http
 import http.client
+import json
+import multiprocessing
+import threading
+import time
+import warnings
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 
-from apispec import BasePlugin, yaml_utils
+try:
+    import brotli
+except ImportError:
+    brotli = None
+from apispec import BasePlugin
 from apispec.exceptions import APISpecError
-from flask import current_app
+from flask import Response, current_app, g, jsonify, request
 from flask.views import MethodView
 
 from apispec_plugins import utils as spec_utils
-from apispec_plugins.base import types
+from apispec_plugins.base import profiling, types
 
 
 class FlaskPlugin(BasePlugin):
-    """APISpec plugin for Flask"""
+    """APISpec plugin for Flask
+
+    :param default_media: media type of the auto generated error responses
+    :param profiler: a :class:`~apispec_plugins.base.profiling.Profiler` to
+        record route lookup, docstring parsing and per path timings with
+    :param path_params: document the path parameters of rules with the types
+        of their converters, unless they are documented already
+    :param track_dependencies: keep a copy of the arguments of every path
+        registration, which :meth:`rebuild` needs
+    """
 
-    def __init__(self, default_media="application/json"):
+    def __init__(
+        self,
+        default_media="application/json",
+        profiler=None,
+        path_params=True,
+        track_dependencies=False,
+    ):
         self.spec = None
         self.default_media = default_media
+        self.profiler = profiler
+        self.path_params = path_params
+        self.track_dependencies = track_dependencies
+        self.dependencies = {}
+        self._indexes = weakref.WeakKeyDictionary()
+        self._emitting = False
+        self._generation = 0
+        self._error_responses = {}
+        self._served_endpoints = set()
+        # why paths were documented without compiling request validators
+        self._unvalidated_build = None
+        self._validating = False
 
     def init_spec(self, spec):
         super().init_spec(spec)
         self.spec = spec
+        self._error_responses = {}
 
-    @staticmethod
-    def _rule_view(view, app=None):
+    def _rule_index(self, app):
+        """Get the rule index of the app, rebuilding it if the app changed."""
+        index = self._indexes.get(app)
+        hit = index is not None and index.stamp == RuleIndex.stamp_for(app)
+        profiling.count(self.profiler, "rule index", hit)
+        if not hit:
+            index = self._indexes[app] = RuleIndex(app)
+        return index
+
+    def _view_rules(self, view, app=None, endpoint=None):
         if app is None:
-            app = current_app
+            app = current_app._get_current_object()
 
-        view_funcs = app.view_functions
-        endpoint = next(
-            endpoint for endpoint, view_func in view_funcs.items() if view_func == view
-        )
-        if not endpoint:
+        index = self._rule_index(app)
+        if endpoint is not None:
+            # a view mounted under several endpoints documents the given one
+            if endpoint not in index.rules:
+                raise APISpecError(f"Could not find rules for endpoint {endpoint}")
+            return index.rules[endpoint]
+
+        endpoint = index.endpoints.get(view)
+        if endpoint is None:
+            # the view function may have been replaced in place
+            index = self._indexes[app] = RuleIndex(app)
+            endpoint = index.endpoints.get(view)
+        if endpoint is None:
             raise APISpecError(f"Could not find endpoint for view {view}")
 
-        # TODO: assume 1 rule per view function for now
-        rule = next(app.url_map.iter_rules(endpoint=endpoint))
-        return rule
+        return index.rules[endpoint]
+
+    def serve(
+        self,
+        app,
+        json_url="/openapi.json",
+        yaml_url="/openapi.yaml",
+        endpoint="openapi",
+        build=None,
+        timeout=5.0,
+        retry_after=5,
+    ) -> "SpecServer":
+        """Serve the spec as JSON and YAML from precomputed representations.
+
+        The spec is serialized and compressed once, and again only after it
+        changes. Responses carry strong ETags and honour ``If-None-Match``.
+
+        A build function, such as ``lambda: plugin.register_app(app)``, is
+        run at once in a background thread. Until it is done, requests for the
+        spec wait up to ``timeout`` seconds, then get a 503 with a
+        ``Retry-After`` header. The representations of the built spec replace
+        the previous ones at once, and ``server.build.status()`` reports the
+        build duration or failure, e.g. to health checks.
+
+        :param app: the Flask app to add the spec routes to
+        :param json_url: url of the JSON spec, or None to leave it out
+        :param yaml_url: url of the YAML spec, or None to leave it out
+        :param endpoint: prefix of the spec routes endpoint names
+        :param build: function documenting the app in the background
+        :param timeout: seconds a request waits for the build to be done
+        :param retry_after: seconds clients are told to wait before retrying
+        :return: the server, which can be invalidated to force a regeneration
+        """
+        server = SpecServer(self, timeout=timeout, retry_after=retry_after)
+        if json_url:
+            app.add_url_rule(
+                json_url, f"{endpoint}_json", lambda: server.response("json")
+            )
+            self._served_endpoints.add(f"{endpoint}_json")
+        if yaml_url:
+            app.add_url_rule(
+                yaml_url, f"{endpoint}_yaml", lambda: server.response("yaml")
+            )
+            self._served_endpoints.add(f"{endpoint}_yaml")
+        # the url map is only walked by the build once the routes are added
+        if build is not None:
+            server.build = SpecBuild(server, build, app)
+            server.build.start()
+        return server
+
+    def validate_requests(self, app, **kwargs):
+        """Validate requests with the validators compiled from the spec.
+
+        Before each request, the validator of the matched rule and method is
+        called with the view arguments, query string, headers, cookies and
+        JSON body. The model instances are stored in ``g.validated`` by
+        location and invalid requests get a 400 response listing the errors.
+
+        Only paths documented in this process have validators, so paths
+        loaded from a cache or built by parallel workers can't be validated.
+
+        :param app: the Flask app to validate the requests of
+        :param kwargs: path options, such as ``base_path``, as given to
+            ``spec.path``
+        :raises APISpecError: if the spec was loaded from a cache or built by
+            parallel workers
+        """
+        plugin = next((p for p in self.spec.plugins if hasattr(p, "validator")), None)
+        if plugin is None:
+            raise APISpecError("No plugin of the spec compiles request validators")
+        if self._unvalidated_build is not None:
+            raise APISpecError(
+                "Requests can't be validated, as the spec was"
+                f" {self._unvalidated_build} and has no request validators"
+            )
+        self._validating = True
+        paths = {}
+
+        def validate():
+            rule = request.url_rule
+            if rule is None:
+                return None
+            path = paths.get(rule.rule)
+            if path is None:
+                path = paths[rule.rule] = spec_utils.path_parser(rule.rule, **kwargs)
+            validator = plugin.validator(path, request.method)
+            if validator is None:
+                return None
+            # only the values of the locations with a model are read
+            models = validator.models
+            try:
+                g.validated = validator(
+                    path=request.view_args,
+                    query=request.args if "query" in models else None,
+                    header=request.headers,
+                    cookie=request.cookies if "cookie" in models else None,
+                    body=request.get_json(silent=True) if "body" in models else None,
+                )
+            except ValueError as error:
+                errors = getattr(error, "errors", [{"msg": str(error)}])
+                response = {
+                    "code": 400,
+                    "description": http.client.responses[400],
+                    "errors": errors,
+                }
+                return jsonify(response), 400
+            return None
+
+        app.before_request(validate)
+        return validate
+
+    def spec_state(self):
+        """Cheap token that changes whenever the spec does."""
+        components = spec_utils.spec_components(self.spec).values()
+        return (
+            self._generation,
+            len(self.spec._paths),
+            tuple(len(section) for section in components),
+        )
+
+    def register_app(
+        self,
+        app=None,
+        blueprints=None,
+        exclude_blueprints=(),
+        workers=None,
+        cache=None,
+        **kwargs,
+    ) -> "RegisterReport":
+        """Register the paths of every route of a Flask app in a single pass.
+
+        The url map is walked once and rules are grouped by endpoint, so each
+        view is documented by a single path registration. Static file routes
+        and the spec routes added by :meth:`serve` are skipped.
+
+        With ``workers``, endpoints are split in contiguous chunks documented
+        by a pool of forked processes. The partial paths and components are
+        merged back in order, which gives the same spec as a serial build.
+        Platforms without ``fork`` fall back on a serial build.
+
+        With a ``cache``, the build inputs are fingerprinted and a cached
+        build with the same fingerprint is merged into the spec instead of
+        running the path and operation helpers. Dependencies for rebuilds are
+        not tracked for cached builds.
+
+        :param app: the Flask app, defaults to the current app
+        :param blueprints: names of the blueprints to document, all if None
+        :param exclude_blueprints: names of the blueprints to leave out
+        :param workers: number of worker processes for a parallel build
+        :param cache: a :class:`~apispec_plugins.cache.SpecCache` for the build
+        :param kwargs: extra arguments passed on to each ``spec.path`` call
+        :return: a report with the documented endpoints and phase timings
+        """
+        if app is None:
+            app = current_app._get_current_object()
+
+        report = RegisterReport()
+        start = time.perf_counter()
+        index = self._rule_index(app)
+        endpoints = [
+            endpoint
+            for endpoint in index.rules
+            if self._documents_endpoint(endpoint, blueprints, exclude_blueprints)
+            and not self._is_static(endpoint, index.rules[endpoint])
+            and endpoint not in self._served_endpoints
+        ]
+        report.timings["index"] = time.perf_counter() - start
+
+        if cache is not None:
+            start = time.perf_counter()
+            inputs = self._build_inputs(app, index, endpoints, kwargs)
+            fingerprint = cache.fingerprint(inputs)
+            report.cached = cache.apply(fingerprint, self.spec)
+            report.timings["cache"] = time.perf_counter() - start
+            if report.cached:
+                report.endpoints.extend(endpoints)
+                self._skip_validators("loaded from a cache")
+                return report
+
+        start = time.perf_counter()
+        if (
+            workers
+            and workers > 1
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            self._register_parallel(app, endpoints, workers, report, **kwargs)
+            self._skip_validators("built by parallel workers")
+        else:
+            self._register_endpoints(app, endpoints, **kwargs)
+            report.timings["paths"] = time.perf_counter() - start
+        report.endpoints.extend(endpoints)
+
+        if cache is not None:
+            cache.store(fingerprint, self.spec)
+        return report
 
-    def path_helper(self, operations=None, view=None, app=None, **kwargs):
-        """Path helper hook to set path specs from a Flask view."""
+    def _skip_validators(self, reason):
+        """Record that paths were documented without request validators."""
+        self._unvalidated_build = reason
+        if self._validating:
+            warnings.warn(
+                f"Requests are validated but the spec was {reason}, so its"
+                " paths have no request validators",
+                RuntimeWarning,
+                stacklevel=3,
+            )
+
+    def _build_inputs(self, app, index, endpoints, kwargs):
+        """Everything a build of the endpoints depends on, for fingerprinting."""
+        views = {}
+        for endpoint in endpoints:
+            view = app.view_functions[endpoint]
+            methods = {}
+            if hasattr(view, "view_class") and issubclass(view.view_class, MethodView):
+                for method in view.methods:
+                    method_func = getattr(view.view_class, method.lower())
+                    methods[method] = (
+                        method_func.__doc__,
+                        getattr(method_func, "spec_from", None),
+                        getattr(method_func, "specs", None),
+                    )
+            rules = [(r.rule, sorted(r.methods)) for r in index.rules[endpoint]]
+            views[endpoint] = (rules, view.__doc__, methods)
+
+        spec = self.spec
+        plugins = [
+            (type(plugin).__qualname__, plugin.fingerprint())
+            if hasattr(plugin, "fingerprint")
+            else type(plugin).__qualname__
+            for plugin in spec.plugins
+        ]
+        return {
+            "spec": (spec.title, spec.version, str(spec.openapi_version), spec.options),
+            "state": (spec._paths, spec_utils.spec_components(spec)),
+            "plugins": plugins,
+            "settings": (self.default_media, self.path_params, kwargs),
+            "views": views,
+        }
+
+    def _register_endpoints(self, app, endpoints, **kwargs):
+        # path level fields do not reach the path helper registering the paths
+        # of all rules but the last, so they are copied onto them afterwards
+        fields = {
+            key: kwargs[key]
+            for key in ("summary", "description")
+            if kwargs.get(key) is not None
+        }
+        index = self._rule_index(app)
+        for endpoint in endpoints:
+            view = app.view_functions[endpoint]
+            self.spec.path(view=view, app=app, endpoint=endpoint, **kwargs)
+            if fields:
+                for rule in index.rules[endpoint][:-1]:
+                    path = spec_utils.path_parser(rule.rule, **kwargs)
+                    self.spec._paths[path].update(fields)
+
+    def _register_parallel(self, app, endpoints, workers, report, **kwargs):
+        # a few chunks per worker balance the load while keeping chunks
+        # contiguous, so merging them in order preserves the serial ordering
+        size = max(1, -(-len(endpoints) // (workers * 4)))
+        chunks = [endpoints[i : i + size] for i in range(0, len(endpoints), size)]
+
+        start = time.perf_counter()
+        # forked workers inherit the arguments of their initializer unpickled
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self, app, kwargs),
+        ) as executor:
+            results = list(executor.map(_register_chunk, chunks))
+        report.timings["paths"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for paths, components, dependencies in results:
+            spec_utils.merge_spec(self.spec, paths=paths, components=components)
+            for plugin, plugin_dependencies in zip(self.spec.plugins, dependencies):
+                if hasattr(plugin, "merge_dependencies"):
+                    plugin.merge_dependencies(plugin_dependencies)
+        report.timings["merge"] = time.perf_counter() - start
+
+    def rebuild(self, views=(), models=(), app=None):
+        """Recompute in place the paths affected by changed views or models.
+
+        Paths are tracked back to the ``spec.path`` call that registered them,
+        and other plugins report the paths depending on changed models through
+        their ``invalidate`` method. Only those paths are removed and
+        registered again.
+
+        :param views: changed view functions or endpoint names
+        :param models: changed models or model names
+        :param app: the Flask app, defaults to the current app
+        :return: the rebuilt paths
+        """
+        if not self.track_dependencies:
+            raise APISpecError(
+                "Rebuilding paths needs FlaskPlugin(track_dependencies=True)"
+            )
+        if app is None:
+            app = current_app._get_current_object()
+
+        # a view function may be mounted under several endpoints
+        endpoints = {view for view in views if isinstance(view, str)}
+        endpoints.update(
+            endpoint
+            for endpoint, view_func in app.view_functions.items()
+            if view_func in views
+        )
+        paths = {
+            path
+            for path, sources in self.dependencies.items()
+            if any(source.endpoint in endpoints for source in sources)
+        }
+        for plugin in self.spec.plugins:
+            if plugin is not self and hasattr(plugin, "invalidate"):
+                paths.update(plugin.invalidate(models))
+
+        # a path is rebuilt from all its sources, which may document other paths
+        affected = []
+        pending = list(paths)
+        while pending:
+            for source in self.dependencies.get(pending.pop(), ()):
+                if source in affected:
+                    continue
+                affected.append(source)
+                for path, sources in self.dependencies.items():
+                    if source in sources and path not in paths:
+                        paths.add(path)
+                        pending.append(path)
+        sources = []
+        for path in list(self.dependencies):
+            for source in self.dependencies[path]:
+                if source in affected and source not in sources:
+                    sources.append(source)
+            if path in paths:
+                del self.dependencies[path]
+
+        # path level fields set on spec.path do not reach the helpers
+        kept = {}
+        for path in paths:
+            item = self.spec._paths.pop(path, {})
+            kept[path] = {k: item[k] for k in ("summary", "description") if k in item}
+
+        for source in sources:
+            operations = copy.deepcopy(source.operations)
+            kwargs = copy.deepcopy(source.kwargs)
+            if source.endpoint is None:
+                self.spec.path(path=source.path, operations=operations, **kwargs)
+            else:
+                self.spec.path(
+                    view=app.view_functions[source.endpoint],
+                    app=app,
+                    endpoint=source.endpoint,
+                    operations=operations,
+                    **kwargs,
+                )
+        for path, fields in kept.items():
+            if path in self.spec._paths:
+                self.spec._paths[path].update(fields)
+
+        return sorted(paths)
+
+    def merge_dependencies(self, dependencies):
+        for path, sources in dependencies.items():
+            self.dependencies.setdefault(path, []).extend(sources)
+
+    @staticmethod
+    def _is_static(endpoint, rules):
+        return endpoint.rpartition(".")[2] == "static" and all(
+            rule.rule.endswith("/<path:filename>") for rule in rules
+        )
+
+    @staticmethod
+    def _documents_endpoint(endpoint, blueprints, exclude_blueprints):
+        blueprint = endpoint.rpartition(".")[0]
+
+        def matches(names):
+            return any(
+                blueprint == name or blueprint.startswith(f"{name}.") for name in names
+            )
+
+        if blueprints is not None and not matches(blueprints):
+            return False
+        return not matches(exclude_blueprints)
+
+    def path_helper(
+        self, operations=None, view=None, app=None, endpoint=None, **kwargs
+    ):
+        """Path helper hook to set path specs from a Flask view.
+
+        The rules of the first endpoint of the view are documented, unless
+        another ``endpoint`` of the view is given. Each rule is a path of its
+        own. The path level ``summary`` and ``description`` of ``spec.path``
+        only apply to the path of the last rule, as they are not given to the
+        helpers: ``register_app`` copies them onto the paths of the others.
+        """
+        self._generation += 1
         path = kwargs.pop("path", None)
         if path:
+            if self.track_dependencies and not self._emitting:
+                source = PathSource(None, *copy.deepcopy((operations, kwargs)), path)
+                self.dependencies.setdefault(path, []).append(source)
             return path
 
-        rule = self._rule_view(view, app=app)
+        start = time.perf_counter()
+        view_name = getattr(view, "__name__", view)
+        with profiling.measure(self.profiler, "route", view_name):
+            rules = self._view_rules(view, app=app, endpoint=endpoint)
+        source = None
+        if self.track_dependencies:
+            source = PathSource(rules[0].endpoint, *copy.deepcopy((operations, kwargs)))
+
+        # docstring and method specs are parsed once and shared by all rules
+        with profiling.measure(self.profiler, "docstring", view_name):
+            view_operations = spec_utils.load_operations_from_docstring(view.__doc__)
+            method_operations = {}
+            if hasattr(view, "view_class") and issubclass(view.view_class, MethodView):
+                for method in view.methods:
+                    method_func = getattr(view.view_class, method.lower())
+                    method_operations[method] = spec_utils.load_method_specs(
+                        method_func
+                    )
+
+        # every rule but the last is registered as a path of its own
+        for rule in rules[:-1]:
+            rule_operations = {**operations}
+            rule_operations.update(
+                self._rule_operations(rule, view_operations, method_operations)
+            )
+            path = spec_utils.path_parser(rule.rule, **kwargs)
+            parameters = [*kwargs.get("parameters", ())]
+            parameters += self._path_parameters(rule, rule_operations, parameters)
+            self._emitting = True
+            try:
+                self.spec.path(
+                    path=path,
+                    operations=rule_operations,
+                    **{**kwargs, "parameters": parameters},
+                )
+            finally:
+                self._emitting = False
+            self._track(path, source)
 
-        # populate properties for operations
-        operations.update(yaml_utils.load_operations_from_docstring(view.__doc__))
-        if hasattr(view, "view_class") and issubclass(view.view_class, MethodView):
-            for method in view.methods:
-                if method in rule.methods:
-                    method_name = method.lower()
-                    method = getattr(view.view_class, method_name)
-                    operations[method_name] = spec_utils.load_method_specs(method)
-        return spec_utils.path_parser(rule.rule, **kwargs)
+        rule = rules[-1]
+        operations.update(
+            self._rule_operations(rule, view_operations, method_operations)
+        )
+        path = spec_utils.path_parser(rule.rule, **kwargs)
+        parameters = kwargs.get("parameters")
+        if parameters is not None:
+            parameters += self._path_parameters(rule, operations, parameters)
+        self._track(path, source)
+        if self.profiler is not None:
+            self.profiler.record("path", path, time.perf_counter() - start)
+        return path
+
+    def _track(self, path, source):
+        if source is not None:
+            self.dependencies.setdefault(path, []).append(source)
+
+    def _path_parameters(self, rule, operations, parameters):
+        """Typed path parameters of a rule which are not documented yet."""
+        if not self.path_params:
+            return []
+        documented = [p for p in parameters if isinstance(p, dict)]
+        for operation in operations.values():
+            if isinstance(operation, dict):
+                documented.extend(
+                    p for p in operation.get("parameters", ()) if isinstance(p, dict)
+                )
+        path_params = [p for p in documented if p.get("in") == "path"]
+        # names of path parameters given as a model are only known once resolved
+        if any("name" not in p for p in path_params):
+            return []
+        names = {p["name"] for p in path_params}
+        return [
+            parameter
+            for parameter in spec_utils.path_parameters(
+                rule.rule, self.spec.openapi_version.major
+            )
+            if parameter["name"] not in names
+        ]
+
+    @staticmethod
+    def _rule_operations(rule, view_operations, method_operations):
+        """Operations of a view that apply to the given rule."""
+        operations = {**view_operations}
+        for method, specs in method_operations.items():
+            if method in rule.methods:
+                operations[method.lower()] = specs
+        return operations
 
     def operation_helper(self, path=None, operations=None, **kwargs):
         """Operation helper hook to process operation properties."""
 
-        for op in operations.values():
-            if type(op) is dict:
-                for code in op.get("responses", {}):
-
-                    # handle error codes only
-                    if (
-                        not op["responses"][code]
-                        and isinstance(code, int)
-                        and code >= 400
-                    ):
-
-                        description = http.client.responses[code]
-                        schema_name = description.replace(" ", "")
-                        op["responses"][code] = schema_name
-
-                        http_schema_name = types.HTTPResponse.__name__
-                        if http_schema_name not in self.spec.components.schemas:
-                            self.spec.components.schema(
-                                component_id=http_schema_name,
-                                component=types.HTTPResponse.schema(),
-                            )
-
-                        if schema_name not in self.spec.components.responses:
-                            component = {"schema": http_schema_name}
-                            if self.spec.openapi_version.major >= 3:
-                                component = {"content": {self.default_media: component}}
-                            self.spec.components.response(
-                                component_id=schema_name, component=component
-                            )
+        with profiling.measure(self.profiler, "operations", path):
+            for op in operations.values():
+                if type(op) is dict:
+                    responses = op.get("responses", {})
+                    for code, response in responses.items():
+
+                        # handle error codes only
+                        if not response and isinstance(code, int) and code >= 400:
+                            responses[code] = self._error_response(code)
+
+    def _error_response(self, code):
+        """Name of the response component of an error code, registered once."""
+        name = self._error_responses.get(code)
+        profiling.count(self.profiler, "error response", name is not None)
+        if name is None:
+            name = http.client.responses[code].replace(" ", "")
+
+            http_schema_name = types.HTTPResponse.__name__
+            if http_schema_name not in self.spec.components.schemas:
+                self.spec.components.schema(
+                    component_id=http_schema_name,
+                    component=types.HTTPResponse.schema(),
+                )
+
+            if name not in self.spec.components.responses:
+                component = {"schema": http_schema_name}
+                if self.spec.openapi_version.major >= 3:
+                    component = {"content": {self.default_media: component}}
+                self.spec.components.response(component_id=name, component=component)
+
+            self._error_responses[code] = name
+        return name
+
+
+# state of a parallel build worker, only ever set in the worker process
+_worker_state = None
+
+
+def _init_worker(plugin, app, kwargs):
+    global _worker_state
+    _worker_state = (plugin, app, kwargs)
+
+
+def _register_chunk(endpoints):
+    """Document a chunk of endpoints in a worker and return what was added."""
+    plugin, app, kwargs = _worker_state
+    spec = plugin.spec
+    existing = {
+        section: set(items)
+        for section, items in spec_utils.spec_components(spec).items()
+    }
+
+    # paths of the parent spec are not sent back, only the chunk ones
+    spec._paths.clear()
+    for spec_plugin in spec.plugins:
+        if hasattr(spec_plugin, "merge_dependencies"):
+            spec_plugin.dependencies.clear()
+    plugin._register_endpoints(app, endpoints, **kwargs)
+
+    components = {
+        section: {k: v for k, v in items.items() if k not in existing[section]}
+        for section, items in spec_utils.spec_components(spec).items()
+    }
+    dependencies = [getattr(p, "dependencies", None) for p in spec.plugins]
+    return spec._paths, components, dependencies
+
+
+class SpecServer:
+    """Serves precomputed and precompressed representations of a spec."""
+
+    mimetypes = {"json": "application/json", "yaml": "application/yaml"}
+
+    def __init__(self, plugin, timeout=5.0, retry_after=5):
+        self.plugin = plugin
+        self.build = None
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._state = None
+        self._representations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def encodings():
+        """Supported content encodings, by order of preference."""
+        encodings = {
+            "gzip": lambda b: gzip.compress(b, mtime=0),
+            "deflate": zlib.compress,
+        }
+        if brotli is not None:
+            encodings = {"br": brotli.compress, **encodings}
+        return {**encodings, "identity": bytes}
+
+    def invalidate(self):
+        """Force the representations to be generated again on next request."""
+        with self._lock:
+            self._state = None
+
+    def representations(self):
+        """The representations of the spec, generated again if it changed."""
+        state = self.plugin.spec_state()
+        with self._lock:
+            if state != self._state:
+                self._representations = self._generate()
+                self._state = state
+            return self._representations
+
+    def _generate(self):
+        spec = self.plugin.spec
+        bodies = {
+            "json": json.dumps(spec.to_dict()).encode(),
+            "yaml": spec.to_yaml().encode(),
+        }
+        representations = {}
+        for fmt, body in bodies.items():
+            digest = hashlib.sha256(body).hexdigest()[:32]
+            representations[fmt] = {
+                encoding: (encode(body), f"{digest}-{encoding}")
+                for encoding, encode in self.encodings().items()
+            }
+        return representations
+
+    def response(self, fmt):
+        """Response to a request for the spec in the given format."""
+        if self.build is not None and not self.build.wait(self.timeout):
+            response = Response(status=503)
+            response.retry_after = self.retry_after
+            return response
+        if self.build is not None and self.build.error is not None:
+            return Response(status=503)
+
+        variants = self.representations()[fmt]
+        encoding = request.accept_encodings.best_match(variants, "identity")
+        body, etag = variants[encoding]
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetypes[fmt])
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+class SpecBuild:
+    """Builds a spec in a background thread for a server to wait on.
+
+    Once done, ``duration`` is the build time in seconds and ``error`` the
+    exception the build failed with, if any.
+    """
+
+    def __init__(self, server, build, app):
+        self.server = server
+        self.app = app
+        self.duration = None
+        self.error = None
+        self._build = build
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="spec-build", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                self._build()
+            # representations are swapped in before any request sees the spec
+            self.server.representations()
+        except Exception as error:
+            self.error = error
+        finally:
+            self.duration = time.perf_counter() - start
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """Wait for the build to be done, returning whether it is."""
+        return self._done.wait(timeout)
+
+    def status(self):
+        """State of the build, its duration and error, for health checks."""
+        if not self._done.is_set():
+            return {"state": "building", "duration": None, "error": None}
+        return {
+            "state": "failed" if self.error is not None else "ready",
+            "duration": self.duration,
+            "error": None if self.error is None else repr(self.error),
+        }
+
+
+@dataclass(eq=False)
+class PathSource:
+    """The arguments of a path registration, to register it again later."""
+
+    endpoint: str | None
+    operations: dict
+    kwargs: dict
+    path: str | None = None
+
+
+@dataclass
+class RegisterReport:
+    """Outcome of registering the routes of an app with the spec."""
+
+    endpoints: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    cached: bool = False
+
+
+class RuleIndex:
+    """Lookup tables from view functions to endpoints and url rules of an app.
+
+    Built in a single pass over the app view functions and url map so that
+    resolving the rules of a view is O(1) instead of a scan per lookup.
+    """
+
+    def __init__(self, app):
+        self.stamp = self.stamp_for(app)
+        self.endpoints = {}
+        self.rules = {}
+        for endpoint, view_func in app.view_functions.items():
+            self.endpoints.setdefault(view_func, endpoint)
+        for rule in app.url_map.iter_rules():
+            self.rules.setdefault(rule.endpoint, []).append(rule)
+
+    @staticmethod
+    def stamp_for(app):
+        """Cheap fingerprint of the app routing state used for invalidation.
+
+        Reading it is O(1): rules are counted as they are added to the url
+        map, instead of counting the rules of the map on every lookup.
+        """
+        url_map = app.url_map
+        added = getattr(url_map, "_apispec_rules_added", None)
+        if added is None:
+            added = RuleIndex._count_rules(url_map)
+        return len(app.view_functions), added
+
+    @staticmethod
+    def _count_rules(url_map):
+        """Count the rules or rule factories added to a url map from now on."""
+        add = url_map.add
+
+        def counted_add(rulefactory):
+            add(rulefactory)
+            url_map._apispec_rules_added += 1
+
+        url_map._apispec_rules_added = 0
+        url_map.add = counted_add
+        return 0
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from apispec.ext.marshmallow.openapi import marshmallow as ma
+from apispec_plugins.base.mixin import DataclassSchemaMixin
+
+
+@dataclass
+class Error(DataclassSchemaMixin):
+    code: int
+    description: Optional[str] = None
+
+
+class TestDataclassSchemaMixin:
+    def test_schema(self):
+        assert Error.schema() == {
+            "type": "object",
+            "properties": {
+                "code": {"type": "integer"},
+                "description": {"type": "string"},
+            },
+            "required": ["code"],
+        }
+
+    def test_schema_is_resolved_once(self, mocker):
+        @dataclass
+        class Pet(DataclassSchemaMixin):
+            name: str
+
+        from_dict = mocker.spy(ma.Schema, "from_dict")
+        Pet.schema()["properties"].clear()
+        assert "name" in Pet.schema()["properties"]
+        assert from_dict.call_count == 1
+
+        Pet.marshmallow_resolver("3.0.3")
+        Pet.marshmallow_resolver("3.0.3")
+        assert from_dict.call_count == 2
@@ -0,0 +1,51 @@
+import gc
+
+import pytest
+from apispec_plugins.base.registry import ClassRegistry, RegistryError
+
+
+def make_class(name, module):
+    return type(name, (), {"__module__": module})
+
+
+class TestClassRegistry:
+    def test_lookup_by_name(self):
+        registry = ClassRegistry()
+        pet = make_class("Pet", "pets")
+        registry.register(pet)
+        assert registry.get_cls("Pet") is pet
+        assert registry.get_cls("pets.Pet") is pet
+        assert list(registry) == ["pets.Pet"]
+
+    def test_same_name_in_different_modules(self):
+        registry = ClassRegistry()
+        pet, other_pet = make_class("Pet", "pets"), make_class("Pet", "shop")
+        registry.register(pet)
+        registry.register(other_pet)
+        assert registry.get_cls("pets.Pet") is pet
+        assert registry.get_cls("shop.Pet") is other_pet
+        with pytest.raises(RegistryError):
+            registry.get_cls("Pet")
+
+    def test_redefined_class_replaces_previous(self):
+        registry = ClassRegistry()
+        registry.register(make_class("Pet", "pets"))
+        pet = make_class("Pet", "pets")
+        registry.register(pet)
+        assert registry.get_cls("Pet") is pet
+
+    def test_unloaded_classes_are_collected(self):
+        registry = ClassRegistry()
+        registry.register(make_class("Pet", "pets"))
+        gc.collect()
+        assert len(registry) == 0
+        with pytest.raises(RegistryError):
+            registry.get_cls("Pet")
+
+    def test_parent_fallback(self):
+        parent = ClassRegistry()
+        registry = ClassRegistry(parent=parent)
+        pet = make_class("Pet", "pets")
+        parent.register(pet)
+        assert registry.get_cls("Pet") is pet
+        assert "pets.Pet" not in registry
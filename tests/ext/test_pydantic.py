@@ -1,7 +1,21 @@
+import gc
+import json
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 import pytest
 from apispec import APISpec
 from apispec.exceptions import DuplicateComponentNameError
-from apispec_plugins.ext.pydantic import PydanticPlugin
+from apispec_plugins.base.registry import ClassRegistry, RegistryError
+from apispec_plugins.ext.pydantic import (
+    BaseModel,
+    PydanticPlugin,
+    RequestValidationError,
+    RequestValidator,
+)
+from pydantic import BaseModel as PBaseModel, create_model
+from werkzeug.datastructures import ImmutableMultiDict, MultiDict
 
 from ..conftest import Pet
 from ..utils import (
@@ -15,6 +29,32 @@ from ..utils import (
 )
 
 
+class Owner(BaseModel):
+    name: str
+
+
+class OwnedPet(BaseModel):
+    name: str
+    owner: Owner
+
+
+class Household(BaseModel):
+    owners: List[Owner]
+    pets: List[OwnedPet]
+
+
+class PetQuery(BaseModel):
+    limit: int = 10
+    tags: List[str] = []
+
+
+class Node(BaseModel):
+    children: List["Node"] = []
+
+
+Node.update_forward_refs()
+
+
 @pytest.fixture(params=("2.0", "3.0.3"))
 def spec(request):
     return APISpec(
@@ -200,3 +240,218 @@ class TestPydanticPlugin:
         header = {"schema": schema}
         spec.components.header("Pet", component=header)
         assert "Pet" in get_headers(spec)
+
+    def test_model_schema_is_cached(self, spec, mocker):
+        expected = Pet.schema()
+        resolver = spec.plugins[0].resolver
+        schema_spy = mocker.spy(Pet, "schema")
+        resolver.to_schema(Pet)["properties"].clear()
+        assert resolver.to_schema(Pet) == expected
+        assert schema_spy.call_count == 1
+
+        spec.plugins[0].clear_cache(Pet)
+        resolver.to_schema(Pet)
+        assert schema_spy.call_count == 2
+
+    def test_parameters_are_expanded_once(self, spec, mocker):
+        model_schema = mocker.spy(spec.plugins[0].resolver, "model_schema")
+        for path in ("/pets", "/owners"):
+            parameters = [{"in": "query", "schema": PetQuery}]
+            spec.path(path=path, operations={"get": {"parameters": parameters}})
+
+        assert model_schema.call_count == 1
+        for path in ("/pets", "/owners"):
+            parameters = get_paths(spec)[path]["get"]["parameters"]
+            assert [p["name"] for p in parameters] == ["limit", "tags"]
+
+    def test_parameter_components(self, spec):
+        spec = APISpec(
+            "Swagger Petstore",
+            "1.0.0",
+            str(spec.openapi_version),
+            plugins=(PydanticPlugin(parameter_components=True),),
+        )
+        for path in ("/pets", "/owners"):
+            parameters = [{"in": "query", "schema": PetQuery}]
+            spec.path(path=path, operations={"get": {"parameters": parameters}})
+
+        names = ["PetQuery.query.limit", "PetQuery.query.tags"]
+        refs = [build_ref(spec, "parameter", name) for name in names]
+        for path in ("/pets", "/owners"):
+            assert get_paths(spec)[path]["get"]["parameters"] == refs
+        components = get_parameters(spec)
+        assert list(components) == names
+        assert components["PetQuery.query.limit"]["schema"] == (
+            PetQuery.schema()["properties"]["limit"]
+        )
+
+        assert spec.plugins[0].invalidate([PetQuery]) == {"/pets", "/owners"}
+        assert not spec.components.parameters
+
+    def test_same_named_parameter_components_are_kept_apart(self, spec):
+        spec = APISpec(
+            "Swagger Petstore",
+            "1.0.0",
+            str(spec.openapi_version),
+            plugins=(PydanticPlugin(parameter_components=True),),
+        )
+        # models of different modules sharing a name
+        pets = create_model("Query", __base__=BaseModel, limit=(int, 10))
+        shops = create_model("Query", __base__=BaseModel, limit=(int, 50))
+        for path, model in (("/pets", pets), ("/shops", shops), ("/toys", pets)):
+            parameters = [{"in": "query", "schema": model}]
+            spec.path(path=path, operations={"get": {"parameters": parameters}})
+
+        paths = get_paths(spec)
+        components = get_parameters(spec)
+        pets_ref = paths["/pets"]["get"]["parameters"][0]["$ref"]
+        shops_ref = paths["/shops"]["get"]["parameters"][0]["$ref"]
+        assert pets_ref == build_ref(spec, "parameter", "Query.query.limit")["$ref"]
+        assert shops_ref != pets_ref
+        assert paths["/toys"]["get"]["parameters"][0]["$ref"] == pets_ref
+        assert components["Query.query.limit"]["schema"]["default"] == 10
+        assert components[shops_ref.rsplit("/", 1)[-1]]["schema"]["default"] == 50
+
+    def test_cached_models_can_be_collected(self, spec):
+        model = type("Transient", (BaseModel,), {"__annotations__": {"name": str}})
+        resolver = spec.plugins[0].resolver
+        resolver.to_schema(model)
+        resolver.expand_parameters({"in": "query", "schema": model})
+        model_ref = weakref.ref(model)
+
+        del model
+        gc.collect()
+        assert model_ref() is None
+
+    def test_nested_definitions_are_hoisted(self, spec):
+        spec.components.schema("OwnedPet", model=OwnedPet)
+        spec.components.schema("Household", model=Household)
+
+        schemas = get_schemas(spec)
+        owner_ref = build_ref(spec, "schema", "Owner")
+        pet_ref = build_ref(spec, "schema", "OwnedPet")
+        assert list(schemas) == ["Owner", "OwnedPet", "Household"]
+        assert schemas["OwnedPet"]["properties"]["owner"] == owner_ref
+        assert schemas["Household"]["properties"]["owners"]["items"] == owner_ref
+        assert schemas["Household"]["properties"]["pets"]["items"] == pet_ref
+        assert "definitions" not in schemas["Household"]
+
+    def test_same_named_definitions_are_kept_apart(self, spec):
+        # sub-models of different modules sharing a name
+        street = create_model("Address", __base__=PBaseModel, street=(str, ...))
+        point = create_model(
+            "Address", __base__=PBaseModel, lat=(float, ...), lon=(float, ...)
+        )
+        user = create_model("User", __base__=BaseModel, address=(street, ...))
+        shop = create_model("Shop", __base__=BaseModel, address=(point, ...))
+        spec.components.schema("User", model=user)
+        spec.components.schema("Shop", model=shop)
+        spec.components.schema("Shop2", model=shop)
+
+        schemas = get_schemas(spec)
+        assert len(schemas) == 5
+        assert schemas["User"]["properties"]["address"] == build_ref(
+            spec, "schema", "Address"
+        )
+        assert list(schemas["Address"]["properties"]) == ["street"]
+        ref = schemas["Shop"]["properties"]["address"]["$ref"]
+        assert ref != build_ref(spec, "schema", "Address")["$ref"]
+        assert schemas["Shop2"]["properties"]["address"]["$ref"] == ref
+        address = schemas[ref.rsplit("/", 1)[-1]]
+        assert list(address["properties"]) == ["lat", "lon"]
+
+    def test_self_referencing_model(self, spec):
+        spec.components.schema("Node", model=Node)
+
+        node = get_schemas(spec)["Node"]
+        node_ref = build_ref(spec, "schema", "Node")
+        assert node["properties"]["children"]["items"] == node_ref
+
+    def test_self_referencing_model_all_of(self, spec, mocker):
+        # the schema pydantic v2 generates for self-referencing models
+        node_ref = build_ref(spec, "schema", "Node")
+        definition = {
+            "title": "Node",
+            "type": "object",
+            "properties": {"children": {"type": "array", "items": node_ref}},
+        }
+        schema = {"allOf": [node_ref], "$defs": {"Node": definition}}
+        mocker.patch.object(spec.plugins[0].resolver, "to_schema", return_value=schema)
+        spec.components.schema("Node", model=Node)
+
+        assert get_schemas(spec)["Node"] == definition
+
+    def test_scoped_registry(self):
+        plugin = PydanticPlugin(registry=ClassRegistry())
+        spec = APISpec("Swagger Petstore", "1.0.0", "3.0.3", plugins=(plugin,))
+        with pytest.raises(RegistryError):
+            spec.components.schema("Pet", model="Pet")
+
+        spec.components.schema("Pet", model=Pet)
+        assert "tests.conftest.Pet" in plugin.registry
+
+        content = {"content": {"application/json": {"schema": "Pet"}}}
+        spec.components.response("Pet", component=content)
+        pet_ref = build_ref(spec, "schema", "Pet")
+        assert get_schema(spec, get_responses(spec)["Pet"]) == pet_ref
+
+    def test_concurrent_spec_builds(self):
+        def build(version):
+            spec = APISpec(
+                "Swagger Petstore", "1.0.0", version, plugins=(PydanticPlugin(),)
+            )
+            for model in (Household, OwnedPet, Owner, Node, Pet, "Pet"):
+                name = model if isinstance(model, str) else model.__name__
+                response = {"schema": {"type": "array", "items": model}}
+                if spec.openapi_version.major >= 3:
+                    response = {"content": {"application/json": response}}
+                spec.path(
+                    path=f"/{name.lower()}",
+                    operations={"get": {"responses": {"200": response}}},
+                )
+            return json.dumps(spec.to_dict())
+
+        versions = ["2.0", "3.0.3"] * 32
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(build, versions))
+        assert results == [build(version) for version in versions]
+
+    def test_request_validators(self, spec):
+        body = {"schema": "Pet"}
+        parameters = [{"in": "query", "schema": PetQuery}]
+        operation = {"parameters": parameters}
+        if spec.openapi_version.major >= 3:
+            operation["requestBody"] = {"content": {"application/json": body}}
+        else:
+            parameters.append({"in": "body", "name": "body", **body})
+        spec.path(path="/pet", operations={"post": operation, "get": {}})
+
+        plugin = spec.plugins[0]
+        assert plugin.validator("/pet", "GET") is None
+        validator = plugin.validator("/pet", "POST")
+        assert validator.models == {"query": PetQuery, "body": Pet}
+
+        validated = validator(
+            query={"limit": ["5"], "tags": ["a", "b"]}, body={"name": "Max"}
+        )
+        assert validated["query"] == PetQuery(limit=5, tags=["a", "b"])
+        assert validated["body"] == Pet(name="Max")
+
+        with pytest.raises(RequestValidationError) as error:
+            validator(query={"limit": ["many"]}, body={})
+        assert [e["loc"] for e in error.value.errors] == [
+            ("query", "limit"),
+            ("body", "name"),
+        ]
+
+    def test_request_validator_multi_dicts(self):
+        class Session(BaseModel):
+            session: str
+
+        validator = RequestValidator({"query": PetQuery, "cookie": Session})
+        validated = validator(
+            query=MultiDict([("tags", "a"), ("tags", "b"), ("limit", "5")]),
+            cookie=ImmutableMultiDict([("session", "abc"), ("theme", "dark")]),
+        )
+        assert validated["query"] == PetQuery(limit=5, tags=["a", "b"])
+        assert validated["cookie"] == Session(session="abc")
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+import pytest
+import apispec_plugins
+
+
+def test_lazy_attributes():
+    from apispec_plugins.ext.pydantic import PydanticPlugin
+    from apispec_plugins.webframeworks.flask import FlaskPlugin
+
+    assert apispec_plugins.PydanticPlugin is PydanticPlugin
+    assert apispec_plugins.FlaskPlugin is FlaskPlugin
+    assert set(apispec_plugins.__all__) <= set(dir(apispec_plugins))
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError) as error:
+        apispec_plugins.Unknown
+    assert error.value.__cause__ is None and error.value.__suppress_context__
+
+
+def test_import_does_not_load_plugins():
+    code = (
+        "import sys\n"
+        "from apispec_plugins import RegistryMixin, spec_from\n"
+        "modules = ('flask', 'marshmallow', 'pydantic')\n"
+        "print(','.join(m for m in modules if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
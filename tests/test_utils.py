@@ -0,0 +1,191 @@
+import copy
+import io
+import json
+
+import pytest
+import yaml
+from apispec import APISpec
+from apispec_plugins import utils
+
+from .utils import build_ref
+
+
+DOCSTRING = """Get a pet's name.
+---
+get:
+    description: get a pet's name
+"""
+
+
+class TestDocstringSpecs:
+    def setup_method(self):
+        utils.docstring_cache_clear()
+
+    def test_docstring_is_parsed_once(self):
+        utils.load_operations_from_docstring(DOCSTRING)
+        utils.load_specs_from_docstring(DOCSTRING)
+        info = utils.docstring_cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_cached_specs_are_not_mutated(self):
+        specs = utils.load_yaml_from_docstring(DOCSTRING)
+        specs["get"]["description"] = "changed"
+        specs = utils.load_yaml_from_docstring(DOCSTRING)
+        assert specs == {"get": {"description": "get a pet's name"}}
+
+    def test_empty_docstring(self):
+        assert utils.load_yaml_from_docstring(None) == {}
+        assert utils.load_specs_from_docstring("") == {}
+
+
+class TestPathParser:
+    def setup_method(self):
+        utils.path_cache_clear()
+
+    def test_rule_is_translated_once(self):
+        for _ in range(3):
+            assert utils.path_parser("/api/pet/<int:pet_id>", base_path="/api") == (
+                "/pet/{pet_id}"
+            )
+        assert utils.path_cache_info().misses == 1
+
+    @pytest.mark.parametrize(
+        "rule, schema",
+        [
+            ("<name>", {"type": "string"}),
+            (
+                "<string(length=2):name>",
+                {"type": "string", "minLength": 2, "maxLength": 2},
+            ),
+            ("<int:name>", {"type": "integer", "minimum": 0}),
+            ("<int(signed=True, max=9):name>", {"type": "integer", "maximum": 9}),
+            ("<float:name>", {"type": "number", "minimum": 0}),
+            ("<uuid:name>", {"type": "string", "format": "uuid"}),
+            ("<path:name>", {"type": "string"}),
+            ("<any(cat, 'dog'):name>", {"type": "string", "enum": ["cat", "dog"]}),
+        ],
+    )
+    def test_path_parameters(self, rule, schema):
+        parameter = {"in": "path", "name": "name", "required": True}
+        assert utils.path_parameters(f"/pet/{rule}") == [
+            {**parameter, "schema": schema}
+        ]
+        assert utils.path_parameters(f"/pet/{rule}", 2) == [{**parameter, **schema}]
+
+
+class TestSpecFrom:
+    def setup_method(self):
+        utils.docstring_cache_clear()
+
+    def test_specs_are_loaded_lazily(self):
+        @utils.spec_from({"description": "get a pet's name"})
+        def get():
+            """Get a pet's name."""
+
+        assert not hasattr(get, "specs")
+        assert utils.docstring_cache_info().misses == 0
+
+        specs = utils.load_method_specs(get)
+        assert specs == {
+            "summary": "Get a pet's name.",
+            "description": "get a pet's name",
+        }
+        assert get.specs == specs
+
+        specs["description"] = "changed"
+        assert utils.load_method_specs(get)["description"] == "get a pet's name"
+        assert utils.docstring_cache_info().misses == 1
+
+    def test_unwrapped_view(self):
+        def get():
+            """Get a pet's name."""
+
+        assert utils.spec_from({}, wrap=False)(get) is get
+        assert utils.load_method_specs(get) == {"summary": "Get a pet's name."}
+
+
+class TestSpecStreaming:
+    @pytest.fixture(params=("2.0", "3.0.3"))
+    def spec(self, request):
+        spec = APISpec("Swagger Petstore", "1.0.0", request.param)
+        spec.components.schema("Pet", {"properties": {"name": {"type": "string"}}})
+        spec.components.response("NotFound", {"description": "pet not found"})
+        for i in range(3):
+            spec.path(
+                path=f"/pet/{{petId}}/v{i}",
+                operations={
+                    "get": {
+                        "description": "get a pet\nby id",
+                        "responses": {200: {"description": "a pet"}, 404: "NotFound"},
+                    }
+                },
+            )
+        return spec
+
+    def test_json(self, spec):
+        chunks = list(utils.iter_spec_json(spec, chunk_size=64))
+        assert len(chunks) > 1
+        assert "".join(chunks) == json.dumps(spec.to_dict())
+
+    def test_yaml(self, spec):
+        chunks = list(utils.iter_spec_yaml(spec, chunk_size=64))
+        assert len(chunks) > 1
+        assert yaml.safe_load("".join(chunks)) == spec.to_dict()
+
+    def test_write_spec(self, spec):
+        file = io.StringIO()
+        utils.write_spec(spec, file, fmt="json")
+        assert json.loads(file.getvalue()) == spec.to_dict()
+
+
+class TestDeduplicateSchemas:
+    PAGE = {
+        "title": "Page",
+        "type": "object",
+        "properties": {"total": {"type": "integer"}, "next": {"type": "string"}},
+    }
+    ERROR = {
+        "type": "object",
+        "properties": {"code": {"type": "integer"}, "message": {"type": "string"}},
+    }
+
+    @pytest.fixture(params=("2.0", "3.0.3"))
+    def spec(self, request):
+        spec = APISpec("Swagger Petstore", "1.0.0", request.param)
+        spec.components.schema("Error", copy.deepcopy(self.ERROR))
+        for i, schema in enumerate((self.PAGE, self.PAGE, self.ERROR)):
+            response = {"description": "a page", "schema": copy.deepcopy(schema)}
+            if spec.openapi_version.major >= 3:
+                response["content"] = {
+                    "application/json": {"schema": response.pop("schema")}
+                }
+            spec.path(
+                path=f"/pets/{i}", operations={"get": {"responses": {200: response}}}
+            )
+        return spec
+
+    def get_schema(self, spec, path):
+        response = spec.to_dict()["paths"][path]["get"]["responses"]["200"]
+        if spec.openapi_version.major >= 3:
+            return response["content"]["application/json"]["schema"]
+        return response["schema"]
+
+    def test_copies_are_replaced(self, spec):
+        assert utils.deduplicate_schemas(spec, min_size=32) == {"Page": 2, "Error": 1}
+        assert spec.components.schemas["Page"] == self.PAGE
+        for i, name in enumerate(("Page", "Page", "Error")):
+            assert self.get_schema(spec, f"/pets/{i}") == build_ref(
+                spec, "schema", name
+            )
+
+    def test_small_schemas_are_kept(self, spec):
+        assert utils.deduplicate_schemas(spec, min_size=1024) == {}
+        assert self.get_schema(spec, "/pets/0") == self.PAGE
+
+    def test_nested_copies(self):
+        spec = APISpec("Swagger Petstore", "1.0.0", "3.0.3")
+        envelope = {"type": "object", "properties": {"page": self.PAGE}}
+        spec.components.schema("Pets", copy.deepcopy(envelope))
+        spec.components.schema("Owners", copy.deepcopy(envelope))
+        assert utils.deduplicate_schemas(spec, min_size=32) == {"Page": 2}
+        assert set(spec.components.schemas) == {"Pets", "Owners", "Page"}
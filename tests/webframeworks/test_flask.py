@@ -1,8 +1,19 @@
+import gc
+import gzip
+import json
+import threading
+
 import pytest
 from apispec import APISpec
+from apispec.exceptions import APISpecError
 from apispec_plugins import FlaskPlugin, PydanticPlugin, spec_from
-from flask import Flask
+from apispec_plugins.base import types
+from apispec_plugins.base.profiling import Profiler
+from apispec_plugins.cache import SpecCache
+from apispec_plugins.ext.pydantic import BaseModel
+from flask import Blueprint, Flask
 from flask.views import MethodView
+from werkzeug.routing import Map
 
 from ..utils import (
     build_ref,
@@ -190,6 +201,41 @@ class TestFlaskPlugin:
         spec.path(view=pet)
         assert "/pet/{name}" in get_paths(spec)
 
+    def test_typed_path_parameters(self, app, spec):
+        @app.route("/pet/<int:pet_id>/<any(name, age):field>")
+        def pet(pet_id, field):
+            """---
+            get:
+                parameters:
+                    - in: path
+                      name: field
+                      type: string
+            """
+
+        spec.path(view=pet)
+        parameters = get_paths(spec)["/pet/{pet_id}/{field}"]["parameters"]
+        schema = {"type": "integer", "minimum": 0}
+        if spec.openapi_version.major >= 3:
+            schema = {"schema": schema}
+        assert parameters == [
+            {"in": "path", "name": "pet_id", "required": True, **schema}
+        ]
+
+    def test_typed_path_parameters_disabled(self, app):
+        spec = APISpec(
+            title="Swagger Petstore",
+            version="1.0.0",
+            openapi_version="3.0.3",
+            plugins=(FlaskPlugin(path_params=False),),
+        )
+
+        @app.route("/pet/<int:pet_id>")
+        def pet(pet_id):
+            return str(pet_id)
+
+        spec.path(view=pet)
+        assert "parameters" not in get_paths(spec)["/pet/{pet_id}"]
+
     def test_explicit_app_kwarg(self, spec):
         app = Flask(__name__)
 
@@ -200,6 +246,516 @@ class TestFlaskPlugin:
         spec.path(view=pet, app=app)
         assert "/pet" in get_paths(spec)
 
+    def test_multiple_rules_per_view(self, app, spec):
+        class PetView(MethodView):
+            def get(self):
+                """Get a pet's name."""
+                return "Max"
+
+            def post(self):
+                """Register a pet."""
+                return {}
+
+        method_view = PetView.as_view("pet")
+        app.add_url_rule("/pet", view_func=method_view, methods=("GET", "POST"))
+        app.add_url_rule("/v1/pet", view_func=method_view, methods=("GET",))
+        spec.path(view=method_view)
+        paths = get_paths(spec)
+        assert list(paths) == ["/pet", "/v1/pet"]
+        assert paths["/pet"]["get"] == {"summary": "Get a pet's name."}
+        assert paths["/pet"]["post"] == {"summary": "Register a pet."}
+        assert paths["/v1/pet"] == {"get": {"summary": "Get a pet's name."}}
+
+    def test_multiple_rules_per_function_view(self, app, spec):
+        @app.route("/pet")
+        @app.route("/pet/")
+        def pet():
+            """Get a pet's name.
+            ---
+            get:
+                description: get a pet's name
+            """
+            return "Max"
+
+        spec.path(view=pet)
+        paths = get_paths(spec)
+        assert paths["/pet/"] == paths["/pet"]
+        assert paths["/pet"]["get"] == {"description": "get a pet's name"}
+
+    def test_register_app_path_fields_of_multiple_rules(self, app, spec):
+        @app.route("/pet")
+        @app.route("/v1/pet")
+        def pet():
+            return "Max"
+
+        spec.plugins[0].register_app(app, summary="pets", description="all pets")
+        paths = get_paths(spec)
+        for path in ("/pet", "/v1/pet"):
+            assert paths[path]["summary"] == "pets"
+            assert paths[path]["description"] == "all pets"
+
+    def test_rule_index_invalidation(self, app, spec):
+        @app.route("/pet")
+        def pet():
+            return "Max"
+
+        spec.path(view=pet)
+
+        @app.route("/owner")
+        def owner():
+            return "John"
+
+        spec.path(view=owner)
+        assert "/pet" in get_paths(spec)
+        assert "/owner" in get_paths(spec)
+
+    def test_rule_lookup_does_not_scan_rules(self, app, spec, mocker):
+        views = []
+        for i in range(50):
+            view = self.pet_view(i)
+            app.add_url_rule(f"/pets/{i}", f"pet_{i}", view_func=view)
+            views.append(view)
+        plugin = spec.plugins[0]
+        plugin._view_rules(views[0], app)
+
+        # lookups must not read every rule of the url map
+        iter_rules = mocker.spy(Map, "iter_rules")
+        rules = mocker.patch.object(Map, "_rules", new_callable=mocker.PropertyMock)
+        for view in views:
+            plugin._view_rules(view, app)
+        assert iter_rules.call_count == 0
+        assert rules.call_count == 0
+
+        @app.route("/owner", endpoint="owner")
+        @app.route("/owners/<int:owner_id>", endpoint="owner")
+        def owner(owner_id=None):
+            return "John"
+
+        mocker.stopall()
+        assert [r.rule for r in plugin._view_rules(owner, app)] == [
+            "/owners/<int:owner_id>",
+            "/owner",
+        ]
+
+    def test_unknown_view_raises_error(self, app, spec):
+        def pet():
+            return "Max"
+
+        with pytest.raises(APISpecError):
+            spec.path(view=pet)
+
+    def test_register_app(self, app, spec):
+        @app.route("/pet")
+        def pet():
+            return "Max"
+
+        @app.route("/owner")
+        def owner():
+            return "John"
+
+        report = spec.plugins[0].register_app(app)
+        assert report.endpoints == ["pet", "owner"]
+        assert set(report.timings) == {"index", "paths"}
+        assert list(get_paths(spec)) == ["/pet", "/owner"]
+
+    def test_register_app_view_with_several_endpoints(self, app, spec):
+        def pets():
+            """List pets.
+            ---
+            get:
+                description: list pets
+            """
+            return "Max"
+
+        app.add_url_rule("/pets", "pets", pets)
+        app.add_url_rule("/v2/pets", "pets_v2", pets)
+
+        report = spec.plugins[0].register_app(app)
+        assert report.endpoints == ["pets", "pets_v2"]
+        paths = get_paths(spec)
+        assert list(paths) == ["/pets", "/v2/pets"]
+        assert paths["/v2/pets"]["get"]["description"] == "list pets"
+
+        with pytest.raises(APISpecError):
+            spec.path(view=pets, endpoint="pets_v3")
+
+    def test_register_app_blueprint_filters(self, app, spec):
+        pets = Blueprint("pets", __name__)
+        owners = Blueprint("owners", __name__)
+
+        @pets.route("/pet")
+        def pet():
+            return "Max"
+
+        @owners.route("/owner")
+        def owner():
+            return "John"
+
+        app.register_blueprint(pets)
+        app.register_blueprint(owners)
+
+        report = spec.plugins[0].register_app(app, exclude_blueprints=("owners",))
+        assert report.endpoints == ["pets.pet"]
+        assert list(get_paths(spec)) == ["/pet"]
+
+        report = spec.plugins[0].register_app(app, blueprints=("owners",))
+        assert report.endpoints == ["owners.owner"]
+
+    @pytest.mark.parametrize("version", ("2.0", "3.0.3"))
+    def test_register_app_parallel(self, app, version):
+        for i in range(20):
+            app.add_url_rule(f"/pet/{i}", f"pet_{i}", self.pet_view(i))
+
+        def build(workers):
+            spec = APISpec(
+                title="Swagger Petstore",
+                version="1.0.0",
+                openapi_version=version,
+                plugins=(FlaskPlugin(), PydanticPlugin()),
+            )
+            report = spec.plugins[0].register_app(app, workers=workers)
+            return report, json.dumps(spec.to_dict())
+
+        report, parallel = build(workers=2)
+        assert "merge" in report.timings
+        assert parallel == build(workers=None)[1]
+
+    def test_concurrent_parallel_builds(self):
+        apps = [Flask(f"app_{n}") for n in range(2)]
+        for n, app in enumerate(apps):
+            for i in range(10):
+                app.add_url_rule(f"/app_{n}/{i}", f"pet_{i}", self.pet_view(i))
+        specs = [
+            APISpec("Swagger Petstore", "1.0.0", "3.0.3", plugins=(FlaskPlugin(),))
+            for _ in apps
+        ]
+        barrier = threading.Barrier(len(apps))
+
+        def build(n):
+            barrier.wait()
+            specs[n].plugins[0].register_app(apps[n], workers=2)
+
+        threads = [threading.Thread(target=build, args=(n,)) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for n, spec in enumerate(specs):
+            assert list(get_paths(spec)) == [f"/app_{n}/{i}" for i in range(10)]
+
+    @pytest.mark.parametrize("version", ("2.0", "3.0.3"))
+    def test_register_app_cache(self, app, version, tmp_path, mocker):
+        for i in range(5):
+            app.add_url_rule(f"/pet/{i}", f"pet_{i}", self.pet_view(i))
+
+        def build():
+            spec = APISpec(
+                title="Swagger Petstore",
+                version="1.0.0",
+                openapi_version=version,
+                plugins=(FlaskPlugin(), PydanticPlugin()),
+            )
+            report = spec.plugins[0].register_app(app, cache=SpecCache(tmp_path))
+            return report, spec.to_dict()
+
+        report, built = build()
+        assert not report.cached
+        assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+        path_helper = mocker.spy(FlaskPlugin, "path_helper")
+        report, cached = build()
+        assert report.cached
+        assert json.dumps(cached) == json.dumps(built)
+        assert path_helper.call_count == 0
+
+        app.view_functions["pet_0"].__doc__ = "Changed docstring."
+        report, _ = build()
+        assert not report.cached
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_validate_requests_of_cached_build(self, app, tmp_path):
+        app.add_url_rule("/pet/0", "pet_0", self.pet_view(0))
+        for cached in (False, True):
+            spec = APISpec(
+                title="Swagger Petstore",
+                version="1.0.0",
+                openapi_version="3.0.3",
+                plugins=(FlaskPlugin(), PydanticPlugin()),
+            )
+            plugin = spec.plugins[0]
+            report = plugin.register_app(app, cache=SpecCache(tmp_path))
+            assert report.cached == cached
+        with pytest.raises(APISpecError, match="cache"):
+            plugin.validate_requests(app)
+
+    def test_validate_requests_then_parallel_build(self, app):
+        for i in range(4):
+            app.add_url_rule(f"/pet/{i}", f"pet_{i}", self.pet_view(i))
+        spec = APISpec(
+            title="Swagger Petstore",
+            version="1.0.0",
+            openapi_version="3.0.3",
+            plugins=(FlaskPlugin(), PydanticPlugin()),
+        )
+        plugin = spec.plugins[0]
+        plugin.validate_requests(app)
+        with pytest.warns(RuntimeWarning, match="parallel workers"):
+            plugin.register_app(app, workers=2)
+
+    def test_register_app_cache_mixed_response_codes(self, app, spec, tmp_path):
+        @app.route("/pet")
+        @spec_from({"responses": {200: {"description": "a pet"}, "default": {}}})
+        def pet():
+            return "Max"
+
+        plugin = spec.plugins[0]
+        assert not plugin.register_app(app, cache=SpecCache(tmp_path)).cached
+        assert SpecCache.fingerprint({200: 1, "default": 2}) != SpecCache.fingerprint(
+            {"200": 1, "default": 2}
+        )
+
+    def test_serve_spec(self, app, spec):
+        @app.route("/pet")
+        def pet():
+            """---
+            get:
+                description: get a pet
+            """
+
+        spec.path(view=pet)
+        spec.plugins[0].serve(app)
+        client = app.test_client()
+
+        response = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.data)) == spec.to_dict()
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "/openapi.json",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        assert response.status_code == 304
+
+        response = client.get("/openapi.yaml")
+        assert "Content-Encoding" not in response.headers
+        assert response.data == spec.to_yaml().encode()
+
+        spec.path(path="/owner", operations={"get": {}})
+        response = client.get(
+            "/openapi.json",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "/owner" in json.loads(gzip.decompress(response.data))["paths"]
+
+    def test_serve_spec_built_in_background(self, spec):
+        app = Flask(__name__)
+        plugin, started, release = spec.plugins[0], threading.Event(), threading.Event()
+
+        @app.route("/pet")
+        def pet():
+            """---
+            get:
+                description: get a pet
+            """
+
+        def build():
+            rules = [rule.rule for rule in app.url_map.iter_rules()]
+            assert "/openapi.json" in rules and "/openapi.yaml" in rules
+            started.set()
+            release.wait(5)
+            plugin.register_app(app)
+
+        server = plugin.serve(app, build=build, timeout=0, retry_after=2)
+        client = app.test_client()
+        started.wait(5)
+        assert server.build.status()["state"] == "building"
+
+        response = client.get("/openapi.json")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+
+        release.set()
+        assert server.build.wait(5)
+        response = client.get("/openapi.json")
+        assert response.status_code == 200
+        assert "/pet" in response.json["paths"]
+        assert "/openapi.json" not in response.json["paths"]
+        assert "/openapi.yaml" not in response.json["paths"]
+        status = server.build.status()
+        assert status["state"] == "ready" and status["duration"] > 0
+
+    def test_serve_spec_build_failure(self, app, spec):
+        def build():
+            raise APISpecError("no routes")
+
+        server = spec.plugins[0].serve(app, build=build)
+        assert server.build.wait(5)
+        assert app.test_client().get("/openapi.json").status_code == 503
+        status = server.build.status()
+        assert status["state"] == "failed"
+        assert "no routes" in status["error"]
+
+    def test_profiler(self, app):
+        records = []
+        profiler = Profiler(callback=lambda *record: records.append(record))
+        spec = APISpec(
+            title="Swagger Petstore",
+            version="1.0.0",
+            openapi_version="2.0",
+            plugins=(FlaskPlugin(profiler=profiler), PydanticPlugin(profiler=profiler)),
+        )
+        for i in range(3):
+            app.add_url_rule(f"/pet/{i}", f"pet_{i}", self.pet_view(i))
+        spec.plugins[0].register_app(app)
+
+        report = profiler.report()
+        assert set(report["timings"]) == {
+            "route",
+            "docstring",
+            "path",
+            "operations",
+            "resolve",
+            "register",
+            "model.schema",
+        }
+        assert set(report["timings"]["path"]) == {"/pet/0", "/pet/1", "/pet/2"}
+        assert report["timings"]["path"]["/pet/0"]["calls"] == 1
+        assert report["caches"]["rule index"]["misses"] == 1
+        assert report["caches"]["error response"]["misses"] == 3
+        assert len(records) == sum(
+            entry["calls"]
+            for entries in report["timings"].values()
+            for entry in entries.values()
+        )
+
+    @staticmethod
+    def pet_view(i):
+        def pet():
+            return "Max"
+
+        pet.__doc__ = f"""Get pet {i}.
+        ---
+        get:
+            responses:
+                200:
+                    schema: Pet
+                {400 + i % 5}:
+        """
+        return pet
+
+    def test_dependencies_are_not_tracked_by_default(self, app, spec):
+        @app.route("/pet")
+        def pet():
+            return "Max"
+
+        spec.path(view=pet)
+        plugin = spec.plugins[0]
+        assert plugin.dependencies == {}
+        with pytest.raises(APISpecError):
+            plugin.rebuild(views=[pet])
+
+    def test_rebuild_changed_view(self, app, spec):
+        spec = APISpec(
+            title="Swagger Petstore",
+            version="1.0.0",
+            openapi_version=str(spec.openapi_version),
+            plugins=(FlaskPlugin(track_dependencies=True),),
+        )
+
+        @app.route("/pet")
+        @app.route("/pets/<name>")
+        def pet(name=None):
+            """---
+            get:
+                description: get a pet
+            """
+
+        @app.route("/owner")
+        def owner():
+            """---
+            get:
+                description: get an owner
+            """
+
+        spec.path(view=pet)
+        spec.path(view=owner)
+        spec.path(path="/owner", summary="owners", operations={"post": {}})
+
+        def new_pet(name=None):
+            """---
+            get:
+                description: get a new pet
+            """
+
+        def new_owner():
+            """---
+            get:
+                description: get a new owner
+            """
+
+        app.view_functions["pet"] = new_pet
+        app.view_functions["owner"] = new_owner
+        plugin = spec.plugins[0]
+        assert plugin.rebuild(views=["pet", new_owner]) == [
+            "/owner",
+            "/pet",
+            "/pets/{name}",
+        ]
+        paths = get_paths(spec)
+        assert paths["/pet"]["get"]["description"] == "get a new pet"
+        assert paths["/pets/{name}"]["get"]["description"] == "get a new pet"
+        assert paths["/owner"]["get"]["description"] == "get a new owner"
+        assert paths["/owner"]["summary"] == "owners"
+        assert "post" in paths["/owner"]
+
+    @pytest.mark.parametrize("version", ("2.0", "3.0.3"))
+    def test_rebuild_changed_model(self, app, version):
+        spec = APISpec(
+            title="Swagger Petstore",
+            version="1.0.0",
+            openapi_version=version,
+            plugins=(FlaskPlugin(track_dependencies=True), PydanticPlugin()),
+        )
+
+        def toy_model(*fields):
+            return type(
+                "Toy", (BaseModel,), {"__annotations__": dict.fromkeys(fields, str)}
+            )
+
+        @app.route("/toy")
+        def toy():
+            """---
+            get:
+                parameters:
+                    - in: query
+                      schema: Toy
+            """
+
+        @app.route("/pet")
+        def pet():
+            return "Max"
+
+        # the registry only holds weak references to the models
+        old_toy = toy_model("name")
+        gc.collect()
+        spec.components.schema("Toy", model="Toy")
+        spec.path(view=toy)
+        spec.path(view=pet)
+
+        new_toy = toy_model("name", "color")
+        assert new_toy is not old_toy
+        plugin = spec.plugins[0]
+        assert plugin.rebuild(models=[new_toy]) == ["/toy"]
+
+        parameters = get_paths(spec)["/toy"]["get"]["parameters"]
+        assert [param["name"] for param in parameters] == ["name", "color"]
+        assert list(get_schemas(spec)["Toy"]["properties"]) == ["name", "color"]
+        assert list(get_paths(spec)) == ["/pet", "/toy"]
+
     def test_auto_responses(self, app, spec):
         class PetView(MethodView):
             """A view for pets."""
@@ -238,6 +794,21 @@ class TestFlaskPlugin:
         ref = build_ref(spec, "schema", "HTTPResponse")
         assert get_schema(spec, get_responses(spec)["BadRequest"]) == ref
 
+    def test_error_responses_are_registered_once(self, app, spec, mocker):
+        schema = mocker.spy(types.HTTPResponse, "schema")
+        for i in range(3):
+            spec.path(
+                path=f"/pet/{i}",
+                operations={"get": {"responses": {400: None, 404: None}}},
+            )
+
+        assert schema.call_count == 1
+        assert list(get_responses(spec)) == ["BadRequest", "NotFound"]
+        assert get_paths(spec)["/pet/2"]["get"]["responses"] == {
+            "400": build_ref(spec, "response", "BadRequest"),
+            "404": build_ref(spec, "response", "NotFound"),
+        }
+
     def test_default_dataclass_resolver(self, app, spec, mocker):
         model = "apispec_plugins.base.types.HTTPResponse"
         mocker.patch(f"{model}.__pydantic_model__", None)
@@ -283,3 +854,45 @@ class TestFlaskPlugin:
         assert get_schema(spec, get_responses(spec)["BadRequest"]) == response_ref
         assert "Pet" in get_schemas(spec)
         assert "HTTPResponse" in get_schemas(spec)
+
+    @pytest.mark.parametrize("version", ("2.0", "3.0.3"))
+    def test_validate_requests(self, version):
+        class PetHeaders(BaseModel):
+            x_request_id: str
+
+        app = Flask(__name__)
+        spec = APISpec(
+            title="Swagger Petstore",
+            version="1.0.0",
+            openapi_version=version,
+            plugins=(FlaskPlugin(), PydanticPlugin()),
+        )
+
+        @app.route("/pet/<int:pet_id>", methods=["PUT"])
+        def pet(pet_id):
+            from flask import g
+
+            return {"id": pet_id, "name": g.validated["body"].name}
+
+        body = {"schema": "Pet"}
+        parameters = [{"in": "header", "schema": PetHeaders}]
+        operation = {"parameters": parameters}
+        if spec.openapi_version.major >= 3:
+            operation["requestBody"] = {"content": {"application/json": body}}
+        else:
+            parameters.append({"in": "body", "name": "body", **body})
+        with app.test_request_context():
+            spec.path(view=pet, operations={"put": operation})
+        spec.plugins[0].validate_requests(app)
+
+        client = app.test_client()
+        headers = {"X-Request-Id": "1"}
+        response = client.put("/pet/1", json={"name": "Max"}, headers=headers)
+        assert response.json == {"id": 1, "name": "Max"}
+
+        response = client.put("/pet/1", json={})
+        assert response.status_code == 400
+        assert [e["loc"] for e in response.json["errors"]] == [
+            ["header", "x_request_id"],
+            ["body", "name"],
+        ]